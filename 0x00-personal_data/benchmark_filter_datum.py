@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Module to benchmark filter_datum
+
+Compares the compiled redactor with the former filter_datum, which
+built and compiled its regex on each call, across message sizes and
+numbers of redacted fields, for str and bytes messages:
+
+    $ python3 benchmark_filter_datum.py [calls]
+"""
+import re
+import sys
+import time
+from typing import Callable, List
+
+from filtered_logger import filter_datum
+
+
+def legacy_filter_datum(
+    fields: List[str], redaction: str, message: str, separator: str
+) -> str:
+    """Former filter_datum"""
+    pattern = r"(" + "|".join(
+        [f"{field}=[^ {separator}]+" for field in fields]) + r")"
+    return re.sub(
+        pattern, lambda m: m.group(0).split("=")[0] + "=" + redaction, message
+    )
+
+
+def make_message(pairs: int, fields: List[str]) -> str:
+    """Message of `pairs` key=value pairs, one in four redacted"""
+    items = []
+    for i in range(pairs):
+        key = fields[i % len(fields)] if i % 4 == 0 else "key{}".format(i)
+        items.append("{}=value{}".format(key, i))
+    return ";".join(items) + ";"
+
+
+def microseconds_per_call(fn: Callable[[], object], calls: int) -> float:
+    """Average duration of fn() in microseconds"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("{:>6} {:>6} {:>12} {:>12} {:>8} {:>12}".format(
+        "fields", "pairs", "former us", "compiled us", "speedup",
+        "bytes us"))
+    for field_count in (5, 20, 100):
+        fields = ["field{}".format(i) for i in range(field_count)]
+        for pairs in (5, 50, 500):
+            message = make_message(pairs, fields)
+            data = message.encode("utf-8")
+            assert filter_datum(fields, "***", message, ";") == \
+                legacy_filter_datum(fields, "***", message, ";")
+            n = max(1, calls * 5 // pairs)
+            old = microseconds_per_call(
+                lambda: legacy_filter_datum(fields, "***", message, ";"), n)
+            new = microseconds_per_call(
+                lambda: filter_datum(fields, "***", message, ";"), n)
+            raw = microseconds_per_call(
+                lambda: filter_datum(fields, "***", data, ";"), n)
+            print("{:>6} {:>6} {:>12.2f} {:>12.2f} {:>7.1f}x {:>12.2f}"
+                  .format(field_count, pairs, old, new, old / new, raw))
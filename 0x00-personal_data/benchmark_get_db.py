@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Module to benchmark get_db
+
+Runs the same short query with a new connection each time, as get_db
+did, then with connections of a pool and their cached statements:
+
+    $ python3 benchmark_get_db.py [queries]
+
+The database is the one of the PERSONAL_DATA_DB_* variables, e.g.
+PERSONAL_DATA_DB_ENGINE=sqlite PERSONAL_DATA_DB_NAME=bench.db.
+"""
+import sys
+import time
+
+from db_pool import ConnectionPool, get_connector
+
+QUERY = "SELECT 1"
+
+
+def fresh_connections(queries: int) -> float:
+    """Seconds to run the queries, connecting for each"""
+    connector = get_connector()
+    start = time.perf_counter()
+    for _ in range(queries):
+        connection = connector.connect()
+        cursor = connection.cursor()
+        cursor.execute(QUERY)
+        cursor.fetchall()
+        cursor.close()
+        connection.close()
+    return time.perf_counter() - start
+
+
+def pooled_connections(queries: int) -> float:
+    """Seconds to run the queries with connections of a pool"""
+    pool = ConnectionPool(get_connector())
+    start = time.perf_counter()
+    for _ in range(queries):
+        with pool.acquire() as db:
+            db.execute(QUERY).fetchall()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    fresh = fresh_connections(queries)
+    pooled = pooled_connections(queries)
+    print("fresh:  {:8.1f} us/query".format(fresh * 1e6 / queries))
+    print("pooled: {:8.1f} us/query ({:.1f}x)".format(
+        pooled * 1e6 / queries, fresh / pooled))
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Module to pool the connections of get_db
+
+A connector opens, checks and closes the connections of one database
+engine: `MySQLConnector` (mysql-connector-python) or `SQLiteConnector`,
+which stands in for MySQL in tests and benchmarks. `ConnectionPool`
+keeps up to `size` connections open, checks the ones that have been
+idle for a while before lending them, and reconnects with exponential
+backoff. Each pooled connection caches the cursors of its statements.
+"""
+from collections import OrderedDict
+from os import getenv
+from typing import Any, Sequence
+import random
+import sqlite3
+import threading
+import time
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+PERSONAL_DATA_DB_ENGINE = getenv("PERSONAL_DATA_DB_ENGINE", "mysql")
+try:
+    PERSONAL_DATA_DB_PORT = int(getenv("PERSONAL_DATA_DB_PORT", 3306))
+except ValueError:
+    PERSONAL_DATA_DB_PORT = 3306
+try:
+    PERSONAL_DATA_DB_POOL_SIZE = int(getenv("PERSONAL_DATA_DB_POOL_SIZE", 5))
+except ValueError:
+    PERSONAL_DATA_DB_POOL_SIZE = 5
+try:
+    PERSONAL_DATA_DB_POOL_TIMEOUT = float(
+        getenv("PERSONAL_DATA_DB_POOL_TIMEOUT", 30))
+except ValueError:
+    PERSONAL_DATA_DB_POOL_TIMEOUT = 30.0
+try:
+    PERSONAL_DATA_DB_PING_INTERVAL = float(
+        getenv("PERSONAL_DATA_DB_PING_INTERVAL", 30))
+except ValueError:
+    PERSONAL_DATA_DB_PING_INTERVAL = 30.0
+try:
+    PERSONAL_DATA_DB_RETRIES = int(getenv("PERSONAL_DATA_DB_RETRIES", 5))
+except ValueError:
+    PERSONAL_DATA_DB_RETRIES = 5
+try:
+    PERSONAL_DATA_DB_BACKOFF = float(getenv("PERSONAL_DATA_DB_BACKOFF", 0.1))
+except ValueError:
+    PERSONAL_DATA_DB_BACKOFF = 0.1
+try:
+    PERSONAL_DATA_DB_STATEMENT_CACHE = int(
+        getenv("PERSONAL_DATA_DB_STATEMENT_CACHE", 64))
+except ValueError:
+    PERSONAL_DATA_DB_STATEMENT_CACHE = 64
+
+
+class PoolTimeout(Exception):
+    """No connection of the pool was released in time"""
+
+
+class Connector:
+    """Opens and checks the connections of a database engine"""
+
+    # DB-API placeholder style of the engine
+    paramstyle = "qmark"
+    # exceptions of the engine
+    errors = (Exception,)
+
+    def connect(self) -> Any:
+        """New connection"""
+        raise NotImplementedError()
+
+    def ping(self, connection) -> bool:
+        """Whether the connection still works"""
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except self.errors:
+            return False
+
+    def statement_cursor(self, connection) -> Any:
+        """Cursor to execute the same statement again and again"""
+        return connection.cursor()
+
+    def streaming_cursor(self, connection) -> Any:
+        """Cursor fetching its rows from the server as they are read"""
+        return connection.cursor()
+
+
+class MySQLConnector(Connector):
+    """MySQL connections, statements prepared on the server"""
+
+    paramstyle = "format"
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 database: str):
+        if mysql is None:
+            raise ImportError("MySQLConnector requires "
+                              "mysql-connector-python")
+        self.errors = (mysql.connector.Error,)
+        self.params = {"host": host, "port": port, "user": user,
+                       "password": password, "database": database}
+
+    def connect(self) -> "mysql.connector.connection.MySQLConnection":
+        """New connection"""
+        return mysql.connector.connect(**self.params)
+
+    def ping(self, connection) -> bool:
+        """Whether the connection still works"""
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except self.errors:
+            return False
+
+    def statement_cursor(self, connection) -> Any:
+        """Cursor of a prepared statement"""
+        return connection.cursor(prepared=True)
+
+    def streaming_cursor(self, connection) -> Any:
+        """Unbuffered cursor"""
+        return connection.cursor(buffered=False)
+
+
+class SQLiteConnector(Connector):
+    """SQLite connections, usable by any thread of the pool; with
+    ":memory:", the connections of a connector share one in-memory
+    database, which lasts as long as one of them is open"""
+
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path: str,
+                 statement_cache: int = PERSONAL_DATA_DB_STATEMENT_CACHE):
+        self.path = path
+        self.statement_cache = statement_cache
+        if path == ":memory:":
+            self.database = "file:db_pool_{}?mode=memory&cache=shared" \
+                .format(id(self))
+        else:
+            self.database = path
+
+    def connect(self) -> sqlite3.Connection:
+        """New connection"""
+        return sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=self.statement_cache,
+                               uri=self.database != self.path)
+
+
+class PoolEntry:
+    """Connection kept by a pool, with the cursors of its statements, up
+    to `statement_cache` statements"""
+
+    def __init__(self, connector: Connector, connection,
+                 statement_cache: int = PERSONAL_DATA_DB_STATEMENT_CACHE):
+        self.connector = connector
+        self.connection = connection
+        self.statements = OrderedDict()
+        self.statement_cache = statement_cache
+        self.broken = False
+        self.released_at = time.monotonic()
+
+    def execute(self, statement: str, params: Sequence = ()) -> Any:
+        """Execute a statement with the cursor cached for it, return the
+        cursor"""
+        cursor = self.statements.get(statement)
+        if cursor is None:
+            cursor = self.connector.statement_cursor(self.connection)
+            self.statements[statement] = cursor
+            if len(self.statements) > self.statement_cache:
+                self.statements.popitem(last=False)[1].close()
+        else:
+            self.statements.move_to_end(statement)
+        try:
+            cursor.execute(statement, params)
+        except self.connector.errors:
+            self.broken = not self.connector.ping(self.connection)
+            raise
+        return cursor
+
+    def dispose(self) -> None:
+        """Close the cursors and the connection"""
+        for cursor in self.statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.statements.clear()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """Connection lent by a pool: `close` gives it back, and `execute`
+    reuses the cursor of the statement. The other attributes are the ones
+    of the connection. Each `acquire` lends a new PooledConnection, so
+    closing a stale one again gives back nothing."""
+
+    def __init__(self, pool: "ConnectionPool", entry: PoolEntry):
+        self._pool = pool
+        self._entry = entry
+
+    def _current(self) -> PoolEntry:
+        """Entry of the lease, if not given back yet"""
+        entry = self._entry
+        if entry is None:
+            raise ValueError("connection given back to the pool")
+        return entry
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._current().connection, name)
+
+    def execute(self, statement: str, params: Sequence = ()) -> Any:
+        """Execute a statement with the cursor cached for it, return the
+        cursor"""
+        return self._current().execute(statement, params)
+
+    def streaming_cursor(self) -> Any:
+        """Cursor fetching its rows from the server as they are read"""
+        entry = self._current()
+        return entry.connector.streaming_cursor(entry.connection)
+
+    def close(self) -> None:
+        """Give the connection back to the pool, once"""
+        self._pool.release(self)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool of at most `size` connections of a connector"""
+
+    def __init__(self, connector: Connector,
+                 size: int = PERSONAL_DATA_DB_POOL_SIZE,
+                 timeout: float = PERSONAL_DATA_DB_POOL_TIMEOUT,
+                 ping_interval: float = PERSONAL_DATA_DB_PING_INTERVAL,
+                 retries: int = PERSONAL_DATA_DB_RETRIES,
+                 backoff: float = PERSONAL_DATA_DB_BACKOFF,
+                 statement_cache: int = PERSONAL_DATA_DB_STATEMENT_CACHE):
+        self.connector = connector
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.statement_cache = statement_cache
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.counters = {"connects": 0, "reuses": 0, "pings": 0,
+                         "failed_pings": 0, "retries": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _connect(self) -> PoolEntry:
+        """New connection, retried with exponential backoff and jitter"""
+        for attempt in range(self.retries + 1):
+            try:
+                connection = self.connector.connect()
+                break
+            except self.connector.errors:
+                if attempt == self.retries:
+                    raise
+                self._count("retries")
+                delay = min(self.backoff * 2 ** attempt, 10.0)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+        self._count("connects")
+        return PoolEntry(self.connector, connection, self.statement_cache)
+
+    def acquire(self, timeout: float = None) -> PooledConnection:
+        """Lend a connection, waiting at most `timeout` seconds for one"""
+        if timeout is None:
+            timeout = self.timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout("no connection released in {} s".format(
+                timeout))
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    entry = self._connect()
+                    break
+                idle = time.monotonic() - entry.released_at
+                if idle < self.ping_interval:
+                    self._count("reuses")
+                    break
+                self._count("pings")
+                if self.connector.ping(entry.connection):
+                    self._count("reuses")
+                    break
+                self._count("failed_pings")
+                entry.dispose()
+        except BaseException:
+            self._slots.release()
+            raise
+        return PooledConnection(self, entry)
+
+    def release(self, pooled: PooledConnection) -> None:
+        """Take back a lent connection, closed if broken; a connection
+        already given back is ignored"""
+        with self._lock:
+            entry, pooled._entry = pooled._entry, None
+        if entry is None:
+            return
+        if entry.broken:
+            entry.dispose()
+        else:
+            try:
+                entry.connection.rollback()
+            except self.connector.errors:
+                entry.dispose()
+            else:
+                entry.released_at = time.monotonic()
+                with self._lock:
+                    self._idle.append(entry)
+        self._slots.release()
+
+    def close(self) -> None:
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            entry.dispose()
+
+    def metrics(self) -> dict:
+        """Counters of the pool"""
+        with self._lock:
+            metrics = dict(self.counters, idle=len(self._idle))
+        return metrics
+
+
+def get_connector() -> Connector:
+    """Connector of the PERSONAL_DATA_DB_* environment variables;
+    with PERSONAL_DATA_DB_ENGINE=sqlite, PERSONAL_DATA_DB_NAME is the path
+    of the database file"""
+    db_name = getenv("PERSONAL_DATA_DB_NAME", "")
+    if PERSONAL_DATA_DB_ENGINE == "sqlite":
+        return SQLiteConnector(db_name or ":memory:")
+    return MySQLConnector(
+        host=getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        port=PERSONAL_DATA_DB_PORT,
+        user=getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        password=getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        database=db_name)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool of the connector of get_connector, created once"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(get_connector())
+        return _pool
@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """Module to  Encrypt passwords"""
+from os import getenv
 import bcrypt
 
+try:
+    BCRYPT_ROUNDS = int(getenv("BCRYPT_ROUNDS", 12))
+except ValueError:
+    BCRYPT_ROUNDS = 12
 
-def hash_password(password: str) -> bytes:
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """
     Hashes and salts a password using bcrypt.
 
     Arguments:
         password (str): password to be hashed and salted.
+        rounds (int): bcrypt cost factor, BCRYPT_ROUNDS by default; each
+            extra round doubles the hashing time.
     """
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    if rounds is None:
+        rounds = BCRYPT_ROUNDS
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
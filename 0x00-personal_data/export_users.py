@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Module to export the users table, redacted
+
+    $ python3 export_users.py [-o users.log] [--format pairs|json]
+    $ python3 export_users.py --sqlite users.db --seed 1000000 -o -
+
+Rows are read by batches from an unbuffered cursor and written as they
+come, so memory stays constant whatever the size of the table. The
+`PII_FIELDS` columns are replaced by the redaction. The database is the
+MySQL one of `get_db`, or a SQLite file with `--sqlite` (`--seed` first
+fills it with sample users). Rows/sec are printed on stderr.
+"""
+from operator import itemgetter
+from os import getenv
+from typing import IO, Callable, Iterator, List, Sequence
+import argparse
+import json
+import sys
+import time
+
+from db_pool import ConnectionPool, PooledConnection, SQLiteConnector
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_db
+
+try:
+    EXPORT_BATCH_SIZE = int(getenv("EXPORT_BATCH_SIZE", 1000))
+except ValueError:
+    EXPORT_BATCH_SIZE = 1000
+
+USERS_COLUMNS = ("name", "email", "phone", "ssn", "password", "ip",
+                 "last_login", "user_agent")
+
+
+def iter_rows(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple]:
+    """Rows of an executed cursor, fetched `batch_size` at a time"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def compile_row_formatter(columns: Sequence[str], fmt: str = "pairs",
+                          fields: Sequence[str] = PII_FIELDS,
+                          redaction: str = RedactingFormatter.REDACTION
+                          ) -> Callable[[List[tuple]], str]:
+    """Return a function rendering a batch of rows as lines, once.
+
+    The redacted columns are constants of the row template, so a batch
+    is rendered by one `map` of the template over the rows, with no
+    per-column test.
+    """
+    redacted = set(fields)
+    if fmt == "json":
+        constants = {name: redaction for name in columns
+                     if name in redacted}
+        encode = json.JSONEncoder(default=str).encode
+
+        def render(row: tuple) -> str:
+            """One JSON line"""
+            entry = dict(zip(columns, row))
+            entry.update(constants)
+            return encode(entry)
+    else:
+        kept = [i for i, name in enumerate(columns) if name not in redacted]
+        getter = itemgetter(*kept) if len(kept) > 1 else \
+            (lambda row: tuple(row[i] for i in kept))
+        template = " ".join(
+            "{}={};".format(name.replace("{", "{{").replace("}", "}}"),
+                            redaction.replace("{", "{{").replace("}", "}}")
+                            if name in redacted else "{}")
+            for name in columns)
+
+        def render(row: tuple) -> str:
+            """One line of `column=value;` pairs"""
+            return template.format(*getter(row))
+
+    def render_batch(rows: List[tuple]) -> str:
+        """Lines of a batch of rows"""
+        return "".join(line + "\n" for line in map(render, rows))
+    return render_batch
+
+
+def export_users(db: PooledConnection, stream: IO[str], fmt: str = "pairs",
+                 batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Write the users table, redacted, return how many rows"""
+    cursor = db.streaming_cursor()
+    try:
+        cursor.execute("SELECT * FROM users")
+        columns = [column[0] for column in cursor.description]
+        render_batch = compile_row_formatter(columns, fmt)
+        count = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return count
+            stream.write(render_batch(rows))
+            count += len(rows)
+    finally:
+        cursor.close()
+
+
+def seed_users(db: PooledConnection, count: int) -> None:
+    """Replace the users of a SQLite database by `count` sample users"""
+    db.execute("CREATE TABLE IF NOT EXISTS users ({})".format(
+        ", ".join("{} TEXT".format(name) for name in USERS_COLUMNS)))
+    db.execute("DELETE FROM users")
+    db.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (("User {}".format(i), "user{}@example.com".format(i),
+          "(555) 555-{:04d}".format(i % 10000),
+          "{:03d}-{:02d}-{:04d}".format(i % 1000, i % 100, i % 10000),
+          "hash{}".format(i), "10.0.{}.{}".format(i // 256 % 256, i % 256),
+          "2019-11-14 06:16:24",
+          "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
+         for i in range(count)))
+    db.commit()
+
+
+def main():
+    """Command line interface"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write, - for stdout")
+    parser.add_argument("--format", choices=["pairs", "json"],
+                        default="pairs")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="SQLite database instead of MySQL")
+    parser.add_argument("--seed", type=int, metavar="USERS",
+                        help="fill the SQLite database with sample users")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        db = ConnectionPool(SQLiteConnector(args.sqlite), 1).acquire()
+    else:
+        db = get_db()
+    if args.seed is not None:
+        if not args.sqlite:
+            parser.error("--seed requires --sqlite")
+        seed_users(db, args.seed)
+
+    start = time.perf_counter()
+    stream = sys.stdout if args.output == "-" else \
+        open(args.output, "w", encoding="utf-8")
+    try:
+        count = export_users(db, stream, args.format, args.batch_size)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"exported": count, "rows_per_sec": round(
+        count / elapsed if elapsed > 0 else 0.0, 1)}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,204 @@
 #!/usr/bin/env python3
 """Module to obfuscate a long message"""
 import re
-from typing import List
+from functools import lru_cache, partial
+from typing import Any, AnyStr, Callable, Dict, List, Mapping, Tuple
+import atexit
+import json
 import logging
 import os
-import mysql.connector
+
+from db_pool import PooledConnection, get_pool
+from log_pipeline import LogPipeline
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
 
+LOG_FORMAT = os.getenv("LOG_FORMAT", "holberton")
+
+# attributes of every LogRecord, the others come from `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message", "asctime"}
+_pipeline = None
+
 
 class RedactingFormatter(logging.Formatter):
-    """Redacting Formatter class"""
+    """Redacting Formatter class
+
+    String messages are redacted by matching `field=value` pairs in the
+    formatted line. Structured data, i.e. a dict logged as the message
+    and the `extra=` fields, is redacted by key before being rendered,
+    as `key=value;` pairs or, when `output` is "json", under the "data"
+    key of JSON lines.
+    """
 
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], output: str = "holberton"):
+        if output not in ("holberton", "json"):
+            raise ValueError("unknown output: {}".format(output))
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.output = output
+        self._redact = compile_redactor(tuple(fields), self.REDACTION,
+                                        self.SEPARATOR)
+
+    def structured_data(self, record: logging.LogRecord) -> Dict[str, Any]:
+        """Redacted copy of the dict message and `extra=` fields of a
+        record, None if it has none"""
+        data = None
+        if isinstance(record.msg, Mapping) and not record.args:
+            data = dict(record.msg)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                if data is None:
+                    data = {}
+                data[key] = value
+        if data is not None:
+            for field in self.fields:
+                if field in data:
+                    data[field] = self.REDACTION
+        return data
 
     def format(self, record: logging.LogRecord) -> str:
         """Format a log record and return the formatted record"""
-        msg = super(RedactingFormatter, self).format(record)
-        text = filter_datum(self.fields, self.REDACTION, msg, self.SEPARATOR)
-        return text
+        data = self.structured_data(record)
+        if self.output == "json":
+            return self.format_json(record, data)
+        if data is None:
+            msg = super(RedactingFormatter, self).format(record)
+            return self._redact(msg)
+        message = ""
+        if not isinstance(record.msg, Mapping) or record.args:
+            message = self._redact(record.getMessage()) + " "
+        message += "".join("{}={}{}".format(key, value, self.SEPARATOR)
+                           for key, value in data.items())
+        rendered = logging.makeLogRecord(record.__dict__)
+        rendered.msg, rendered.args = message, None
+        return super(RedactingFormatter, self).format(rendered)
+
+    def format_json(self, record: logging.LogRecord,
+                    data: Dict[str, Any] = None) -> str:
+        """Format a log record as a JSON object on one line"""
+        entry = {"time": self.formatTime(record, self.datefmt),
+                 "name": record.name, "level": record.levelname}
+        if not isinstance(record.msg, Mapping) or record.args:
+            entry["message"] = self._redact(record.getMessage())
+        if data:
+            entry["data"] = data
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+    def __getstate__(self) -> dict:
+        """State without the compiled redactor, e.g. to format in another
+        process"""
+        state = self.__dict__.copy()
+        del state["_redact"]
+        return state
+
+    def __setstate__(self, state: dict):
+        """Restore the state and compile the redactor"""
+        self.__dict__.update(state)
+        self._redact = compile_redactor(tuple(self.fields), self.REDACTION,
+                                        self.SEPARATOR)
 
 
 def get_logger() -> logging.Logger:
-    """Returns a logging.Logger object"""
+    """Returns a logging.Logger object
+
+    The logger only queues its records: they are redacted and written to
+    stderr (or LOG_FILE) by the listener of the log pipeline.
+    """
+    global _pipeline
     logger = logging.getLogger("user_data")
-    stream_handler = logging.StreamHandler().setFormatter(
-        RedactingFormatter(PII_FIELDS)
-    )
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    logger.addHandler(stream_handler)
+    if _pipeline is None:
+        _pipeline = LogPipeline(RedactingFormatter(PII_FIELDS, LOG_FORMAT))
+        logger.addHandler(_pipeline.handler)
+        _pipeline.start()
+        atexit.register(_pipeline.stop)
     return logger
 
 
-def get_db() -> mysql.connector.connection.MySQLConnection:
-    """Connect to secure mysql database"""
-    host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db_name = os.getenv("PERSONAL_DATA_DB_NAME", "")
-    username = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    pwd = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
-    db_connection = mysql.connector.connect(
-        host=host, port=3306, user=username, password=pwd, database=db_name
-    )
-    return db_connection
+def log_metrics() -> dict:
+    """Counters of the log pipeline: enqueued, dropped, processed..."""
+    return _pipeline.metrics() if _pipeline is not None else {}
+
+
+def get_db() -> PooledConnection:
+    """Connect to secure mysql database
+
+    The connection is lent by the pool of db_pool (see the
+    PERSONAL_DATA_DB_* variables); closing it gives it back.
+    """
+    return get_pool().acquire()
+
+
+@lru_cache(maxsize=128)
+def compile_redactor(fields: Tuple[str, ...], redaction: str,
+                     separator: str,
+                     binary: bool = False) -> Callable[[AnyStr], AnyStr]:
+    """Compile once the redaction of `fields` and return a function
+    redacting a message (bytes messages when `binary` is True).
+
+    One regex matches `field=value` for all the fields in a single pass,
+    where the value stops at a space or the separator.
+    """
+    if not fields:
+        return lambda message: message
+    names = "|".join(re.escape(field) for field in fields)
+    pattern = r"({})=[^ {}]+".format(names, re.escape(separator))
+    suffix = "=" + redaction
+    if binary:
+        pattern = pattern.encode("utf-8")
+        suffix = suffix.encode("utf-8")
+
+    def replace(match):
+        """Keep the field name, redact its value"""
+        return match.group(1) + suffix
+    return partial(re.compile(pattern).sub, replace)
 
 
 def filter_datum(
-    fields: List[str], redaction: str, message: str, separator: str
-) -> str:
+    fields: List[str], redaction: str, message: AnyStr, separator: str
+) -> AnyStr:
     """Filter out specific data fields from a given message
     and replaces their values with a redaction string.
 
     Arguments:
         fields (list): list of strings representing data fields to be redacted
         redaction (str): string to replace the redacted values
-        message (str): The original message containing the data fields.
+        message (str or bytes): The original message containing the data
+            fields.
         separator (str): character used to separate data fields in the message
     """
-    pattern = r"(" + "|".join(
-        [f"{field}=[^ {separator}]+" for field in fields]) + r")"
-    return re.sub(
-        pattern, lambda m: m.group(0).split("=")[0] + "=" + redaction, message
-    )
+    redact = compile_redactor(tuple(fields), redaction, separator,
+                              isinstance(message, (bytes, bytearray)))
+    return redact(message)
+
+
+def main():
+    """Log the rows of the users table, redacted, read by batches of
+    EXPORT_BATCH_SIZE rows"""
+    from export_users import EXPORT_BATCH_SIZE, iter_rows
+
+    db = get_db()
+    cursor = db.streaming_cursor()
+    cursor.execute("SELECT * FROM users;")
+    fields = [column[0] for column in cursor.description]
+    logger = get_logger()
+    # every row must be logged, even when the queue is full
+    _pipeline.handler.policy = "block"
+    for row in iter_rows(cursor, EXPORT_BATCH_SIZE):
+        logger.info(dict(zip(fields, row)))
+    cursor.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Module to log through a queue
+
+The calling thread only puts the record in a bounded queue; a listener
+thread formats (e.g. redacts) the records and writes them to the sink by
+batches, optionally formatting them in a process pool.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from logging.handlers import QueueHandler
+from os import getenv
+from typing import IO, List, Mapping
+import logging
+import queue
+import threading
+
+try:
+    LOG_QUEUE_SIZE = int(getenv("LOG_QUEUE_SIZE", 10000))
+except ValueError:
+    LOG_QUEUE_SIZE = 10000
+LOG_QUEUE_POLICY = getenv("LOG_QUEUE_POLICY", "drop")
+try:
+    LOG_BATCH_SIZE = int(getenv("LOG_BATCH_SIZE", 100))
+except ValueError:
+    LOG_BATCH_SIZE = 100
+try:
+    LOG_WORKERS = int(getenv("LOG_WORKERS", 0))
+except ValueError:
+    LOG_WORKERS = 0
+LOG_FILE = getenv("LOG_FILE")
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Handler putting the records in a bounded queue.
+
+    When the queue is full, a record is dropped (policy "drop") or the
+    caller waits for room (policy "block").
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE,
+                 policy: str = LOG_QUEUE_POLICY):
+        if policy not in ("drop", "block"):
+            raise ValueError("unknown queue policy: {}".format(policy))
+        super(BoundedQueueHandler, self).__init__(queue.Queue(maxsize))
+        self.policy = policy
+        self.enqueued = 0
+        self.dropped = 0
+        self._counters_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Copy of the record with its message rendered (or its dict
+        message copied), left to format.
+
+        Unlike QueueHandler.prepare, the record is not formatted here: the
+        formatter runs in the listener.
+        """
+        prepared = logging.makeLogRecord(record.__dict__)
+        if isinstance(record.msg, Mapping) and not record.args:
+            prepared.msg = dict(record.msg)
+        else:
+            prepared.msg = record.getMessage()
+            prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record in the queue, or drop it if the queue is full"""
+        try:
+            if self.policy == "block":
+                self.queue.put(record)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._counters_lock:
+                self.dropped += 1
+            return
+        with self._counters_lock:
+            self.enqueued += 1
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """Stream handler writing a batch of records with one write and one
+    flush, formatted in `pool` if given"""
+
+    def __init__(self, stream: IO[str] = None, pool: Executor = None):
+        super(BatchStreamHandler, self).__init__(stream)
+        self.pool = pool
+
+    def format_batch(self, records: List[logging.LogRecord]) -> List[str]:
+        """Formatted records"""
+        if self.pool is None or len(records) < 2:
+            return [self.format(record) for record in records]
+        formatter = self.formatter or logging.Formatter()
+        chunksize = max(1, len(records) // 8)
+        return list(self.pool.map(formatter.format, records,
+                                  chunksize=chunksize))
+
+    def handle_batch(self, records: List[logging.LogRecord]) -> None:
+        """Filter, format and write records"""
+        records = [record for record in records
+                   if record.levelno >= self.level and self.filter(record)]
+        if not records:
+            return
+        try:
+            lines = self.format_batch(records)
+            with self.lock:
+                self.stream.write(
+                    self.terminator.join(lines) + self.terminator)
+                self.flush()
+        except Exception:
+            self.handleError(records[0])
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write one record"""
+        self.handle_batch([record])
+
+
+class BatchListener:
+    """Consumer of a queue handing the records to its handlers by batches
+    of at most `batch_size`, until it takes `SENTINEL`"""
+
+    SENTINEL = None
+
+    def __init__(self, queue: queue.Queue, *handlers: logging.Handler,
+                 batch_size: int = LOG_BATCH_SIZE):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = max(1, batch_size)
+        self.processed = 0
+        self.batches = 0
+
+    def handle_batch(self, records: List[logging.LogRecord]) -> None:
+        """Pass the records to the handlers"""
+        for handler in self.handlers:
+            if isinstance(handler, BatchStreamHandler):
+                handler.handle_batch(records)
+                continue
+            for record in records:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        self.processed += len(records)
+        self.batches += 1
+
+    def run(self) -> None:
+        """Take a record, and the records already queued behind it"""
+        q = self.queue
+        stop = False
+        while not stop:
+            records = [q.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            taken = len(records)
+            if self.SENTINEL in records:
+                del records[records.index(self.SENTINEL):]
+                stop = True
+            if records:
+                self.handle_batch(records)
+            for _ in range(taken):
+                q.task_done()
+
+    def metrics(self) -> dict:
+        """Counters of the listener"""
+        return {"processed": self.processed, "batches": self.batches,
+                "queued": self.queue.qsize()}
+
+
+class LogPipeline:
+    """Queue handler and batching listener, run by a thread of the
+    pipeline, writing to `stream` (LOG_FILE or stderr by default),
+    formatting in `workers` processes if > 0"""
+
+    def __init__(self, formatter: logging.Formatter, stream: IO[str] = None,
+                 maxsize: int = LOG_QUEUE_SIZE, policy: str = LOG_QUEUE_POLICY,
+                 batch_size: int = LOG_BATCH_SIZE, workers: int = LOG_WORKERS):
+        if stream is None and LOG_FILE:
+            stream = open(LOG_FILE, "a", encoding="utf-8")
+        self.pool = ProcessPoolExecutor(workers) if workers > 0 else None
+        self.sink = BatchStreamHandler(stream, self.pool)
+        self.sink.setFormatter(formatter)
+        self.handler = BoundedQueueHandler(maxsize, policy)
+        self.listener = BatchListener(self.handler.queue, self.sink,
+                                      batch_size=batch_size)
+        self.started = False
+        self._thread = None
+        self._state_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the listener thread"""
+        with self._state_lock:
+            if self.started:
+                return
+            self._thread = threading.Thread(target=self.listener.run,
+                                            name="log-pipeline", daemon=True)
+            self._thread.start()
+            self.started = True
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener"""
+        with self._state_lock:
+            if not self.started:
+                return
+            # waits for room: every queued record is written first
+            self.handler.queue.put(BatchListener.SENTINEL)
+            self._thread.join()
+            self._thread = None
+            self.started = False
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.sink.flush()
+
+    def metrics(self) -> dict:
+        """Counters of the pipeline"""
+        metrics = self.listener.metrics()
+        metrics.update({"enqueued": self.handler.enqueued,
+                        "dropped": self.handler.dropped})
+        return metrics
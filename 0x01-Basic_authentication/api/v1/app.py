@@ -21,6 +21,19 @@ if auth_instance == "auth":
 if auth_instance == "basic_auth":
     auth = BasicAuth()
 
+# paths served without authentication, a trailing * matches any suffix
+EXCLUDED_PATHS = [
+    "/api/v1/status/",
+    "/api/v1/unauthorized/",
+    "/api/v1/forbidden/",
+]
+if getenv("AUTH_EXCLUDED_PATHS"):
+    EXCLUDED_PATHS = [excluded_path.strip() for excluded_path
+                      in getenv("AUTH_EXCLUDED_PATHS").split(",")
+                      if excluded_path.strip()]
+if auth is not None:
+    auth.compile_excluded_paths(EXCLUDED_PATHS)
+
 
 @app.errorhandler(401)
 def unauthorized(error) -> str:
@@ -46,12 +59,7 @@ def authenticate_user() -> str:
     if auth is None:
         return
 
-    excluded_paths = [
-        "/api/v1/status/",
-        "/api/v1/unauthorized/",
-        "/api/v1/forbidden/",
-    ]
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if auth.authorization_header(request) is None:
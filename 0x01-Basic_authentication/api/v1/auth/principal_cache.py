@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Principal cache module for the API
+"""
+from collections import OrderedDict
+from typing import Tuple
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class PrincipalCache:
+    """Bounded LRU cache of authenticated users, with a time-to-live
+
+    Entries are keyed by an HMAC of the raw Authorization header, with a
+    secret drawn at start, so credentials are never kept in memory. Each
+    entry maps to (user_id, password hash, expiration); the password hash
+    lets a hit be rejected once the password changed in another process.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        """Initialize a PrincipalCache"""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    def key(self, authorization_header: str) -> bytes:
+        """Digest of an Authorization header"""
+        return hmac.new(self._secret, authorization_header.encode("utf-8"),
+                        hashlib.sha256).digest()
+
+    def _drop(self, key: bytes):
+        """Remove an entry, the lock must be held"""
+        user_id = self._entries.pop(key)[0]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def get(self, authorization_header: str) -> Tuple[str, str]:
+        """(user_id, password hash) cached for a header, or None"""
+        key = self.key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, authorization_header: str, user_id: str,
+            password: str):
+        """Cache the user authenticated by a header"""
+        key = self.key(authorization_header)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (user_id, password,
+                                  time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, authorization_header: str):
+        """Forget a header"""
+        key = self.key(authorization_header)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate_user(self, user_id: str):
+        """Forget all the headers of a user"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+
+    def metrics(self) -> dict:
+        """Size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
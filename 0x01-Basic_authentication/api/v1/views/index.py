@@ -22,8 +22,12 @@ def stats() -> str:
     """
     from models.user import User
 
+    from api.v1.app import auth
+
     stats = {}
     stats["users"] = User.count()
+    if hasattr(auth, "cache_metrics"):
+        stats["basic_auth_cache"] = auth.cache_metrics()
     return jsonify(stats)
 
 
@@ -2,18 +2,45 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
+from models.serializer import stream_json_array, stream_ndjson
 from models.user import User
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users to return
+      - after: ID of the last user of the previous page
+      - format: `ndjson` for one User JSON object per line
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, ordered by ID and streamed
+      - X-Next-Cursor header: `after` value of the next page, if any
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        users = User.page(after, limit)
+    else:
+        users = User.iterate(after)
+
+    if request.args.get('format') == 'ndjson':
+        response = Response(stream_ndjson(users),
+                            mimetype='application/x-ndjson')
+    else:
+        response = Response(stream_json_array(users),
+                            mimetype='application/json')
+    if limit is not None and len(users) == limit:
+        response.headers['X-Next-Cursor'] = users[-1].id
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
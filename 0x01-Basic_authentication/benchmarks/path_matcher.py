@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Speed of Auth.require_auth with many excluded paths
+
+Compares the compiled PathMatcher with the former loop running
+fnmatch.fnmatch on each excluded path.
+
+    $ python3 -m benchmarks.path_matcher [patterns] [lookups]
+"""
+import fnmatch
+import random
+import sys
+import time
+
+from api.v1.auth.path_matcher import PathMatcher
+
+
+def fnmatch_require_auth(path: str, excluded_paths: list) -> bool:
+    """ Former Auth.require_auth
+    """
+    tmp_path = path if path[-1] == "/" else path + "/"
+    for excluded_path in excluded_paths:
+        if excluded_path[-1] != "*":
+            if fnmatch.fnmatch(tmp_path, excluded_path):
+                return False
+        elif fnmatch.fnmatch(tmp_path, excluded_path[:-1]):
+            return False
+    return True
+
+
+def make_patterns(count: int) -> list:
+    """ Exact paths, trailing wildcards and other globs, 8:1:1
+    """
+    patterns = []
+    for i in range(count):
+        if i % 10 == 8:
+            patterns.append("/api/v1/public_{}*".format(i))
+        elif i % 10 == 9:
+            patterns.append("/api/v1/files_{}/*.txt".format(i))
+        else:
+            patterns.append("/api/v1/resource_{}/".format(i))
+    return patterns
+
+
+def make_paths(count: int, patterns: int) -> list:
+    """ Mix of excluded and authenticated paths
+    """
+    rand = random.Random(0)
+    paths = []
+    for _ in range(count):
+        i = rand.randrange(patterns * 2)
+        paths.append(rand.choice(("/api/v1/resource_{}",
+                                  "/api/v1/public_{}/x",
+                                  "/api/v1/files_{}/a.txt",
+                                  "/api/v1/users/{}")).format(i))
+    return paths
+
+
+def lookups_per_second(require_auth, paths: list) -> float:
+    """ Calls of require_auth per second
+    """
+    start = time.perf_counter()
+    for path in paths:
+        require_auth(path)
+    return len(paths) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    patterns = make_patterns(count)
+    paths = make_paths(lookups, count)
+
+    start = time.perf_counter()
+    matcher = PathMatcher(patterns)
+    build = time.perf_counter() - start
+
+    old = lookups_per_second(
+        lambda p: fnmatch_require_auth(p, patterns), paths)
+    new = lookups_per_second(lambda p: not matcher.matches(p), paths)
+    print("{} patterns: fnmatch loop {:,.0f} lookups/s, PathMatcher "
+          "{:,.0f} lookups/s ({:.0f}x), built in {:.1f} ms"
+          .format(count, old, new, new / old, build * 1000))
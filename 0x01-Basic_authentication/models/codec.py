@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+""" Codec module
+"""
+from datetime import datetime
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec():
+    """ Stdlib JSON codec of the snapshot files
+    """
+
+    name = "json"
+    extension = "json"
+
+    def dumps(self, obj: dict) -> bytes:
+        """ Encode a dictionary
+        """
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data: bytes) -> dict:
+        """ Decode a dictionary
+        """
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """ orjson codec, same file format as the stdlib one
+    """
+
+    name = "orjson"
+    extension = "json"
+
+    def dumps(self, obj: dict) -> bytes:
+        """ Encode a dictionary
+        """
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> dict:
+        """ Decode a dictionary
+        """
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """ MessagePack codec
+    """
+
+    name = "msgpack"
+    extension = "msgpack"
+
+    def dumps(self, obj: dict) -> bytes:
+        """ Encode a dictionary
+        """
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: bytes) -> dict:
+        """ Decode a dictionary
+        """
+        return msgpack.unpackb(data, raw=False)
+
+
+def get_codec(name: str = None) -> Codec:
+    """ Codec by name: json, orjson, msgpack or auto (fastest available
+    JSON codec). Unknown or unavailable codecs fall back to json
+    """
+    name = (name or "json").lower()
+    if name in ("orjson", "auto") and orjson is not None:
+        return OrjsonCodec()
+    if name == "msgpack" and msgpack is not None:
+        return MsgpackCodec()
+    return Codec()
+
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def parse_timestamp(value: str, fmt: str = ISO_FORMAT) -> datetime:
+    """ Parse a "%Y-%m-%dT%H:%M:%S" timestamp without strptime,
+    other formats go through strptime
+    """
+    if fmt == ISO_FORMAT and len(value) == 19 and value[10] == "T":
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, fmt)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+""" SQLite storage module
+"""
+from datetime import datetime
+from typing import TypeVar, List
+import sqlite3
+import threading
+
+from models.base import TIMESTAMP_FORMAT
+
+
+def quote(name: str) -> str:
+    """ Quote an SQL identifier
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class SQLiteStorage():
+    """ Storage engine keeping each model class in one SQLite table
+
+    Columns are derived from the serialized attributes of the model,
+    `__indexes__` and `__unique__` become SQL indexes, and `search()` runs
+    as a parameterized `WHERE` clause. The database is opened in WAL mode
+    with one connection per thread, so several API workers can share it.
+    """
+
+    def __init__(self, db_path: str = ".db_models.sqlite3"):
+        """ Initialize a SQLiteStorage
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._columns = {}
+        self._sql = {}
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0,
+                                   cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _table(self, cls: type) -> List[str]:
+        """ Create or migrate the table of a class, return its columns
+        """
+        s_class = cls.__name__
+        columns = self._columns.get(s_class)
+        if columns is not None:
+            return columns
+        with self._lock:
+            if self._columns.get(s_class) is not None:
+                return self._columns[s_class]
+            columns = list(cls().to_json(True).keys())
+            conn = self._connection()
+            table = quote(s_class)
+            conn.execute("CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY)"
+                         .format(table))
+            existing = [row[1] for row in
+                        conn.execute("PRAGMA table_info({})".format(table))]
+            for column in columns:
+                if column in existing:
+                    continue
+                try:
+                    conn.execute("ALTER TABLE {} ADD COLUMN {}"
+                                 .format(table, quote(column)))
+                except sqlite3.OperationalError:
+                    # added meanwhile by another worker
+                    pass
+            for attr in cls._indexed_attributes():
+                unique = "UNIQUE " if attr in cls.__unique__ else ""
+                conn.execute("CREATE {}INDEX IF NOT EXISTS {} ON {} ({})"
+                             .format(unique,
+                                     quote("ix_{}_{}".format(s_class, attr)),
+                                     table, quote(attr)))
+            conn.commit()
+            self._columns[s_class] = columns
+            return columns
+
+    def _select(self, cls: type) -> str:
+        """ SELECT clause of a class
+        """
+        sql = self._sql.get((cls.__name__, 'select'))
+        if sql is None:
+            columns = self._table(cls)
+            sql = "SELECT {} FROM {}".format(", ".join(map(quote, columns)),
+                                             quote(cls.__name__))
+            self._sql[(cls.__name__, 'select')] = sql
+        return sql
+
+    def _build(self, cls: type, row: tuple) -> TypeVar('Base'):
+        """ Object from a row
+        """
+        return cls(**dict(zip(self._table(cls), row)))
+
+    def load(self, cls: type):
+        """ Create or migrate the table of a class
+        """
+        self._table(cls)
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object by ID, or None
+        """
+        sql = self._select(cls) + " WHERE id = ?"
+        row = self._connection().execute(sql, (obj_id,)).fetchone()
+        return self._build(cls, row) if row is not None else None
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects with matching attributes
+        """
+        columns = self._table(cls)
+        clauses = []
+        params = []
+        for attr, value in attributes.items():
+            if attr not in columns:
+                raise AttributeError("'{}' object has no attribute '{}'"
+                                     .format(cls.__name__, attr))
+            if value is None:
+                clauses.append("{} IS NULL".format(quote(attr)))
+                continue
+            if type(value) is datetime:
+                value = value.strftime(TIMESTAMP_FORMAT)
+            clauses.append("{} = ?".format(quote(attr)))
+            params.append(value)
+        sql = self._select(cls)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self._connection().execute(sql, params).fetchall()
+        return [self._build(cls, row) for row in rows]
+
+    def page(self, cls: type, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Objects ordered by ID, starting after `after`, at most `limit`
+        """
+        sql = self._select(cls) + " WHERE id > ? ORDER BY id LIMIT ?"
+        params = (after if after is not None else "",
+                  limit if limit is not None else -1)
+        rows = self._connection().execute(sql, params).fetchall()
+        return [self._build(cls, row) for row in rows]
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of a class
+        """
+        self._table(cls)
+        sql = "SELECT COUNT(*) FROM {}".format(quote(cls.__name__))
+        return self._connection().execute(sql).fetchone()[0]
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update one object
+        """
+        cls = obj.__class__
+        columns = self._table(cls)
+        sql = self._sql.get((cls.__name__, 'save'))
+        if sql is None:
+            sql = "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT(id) " \
+                  "DO UPDATE SET {}".format(
+                      quote(cls.__name__),
+                      ", ".join(map(quote, columns)),
+                      ", ".join("?" for _ in columns),
+                      ", ".join("{0} = excluded.{0}".format(quote(c))
+                                for c in columns if c != 'id'))
+            self._sql[(cls.__name__, 'save')] = sql
+        obj_json = obj.to_json(True)
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(sql, [obj_json.get(c) for c in columns])
+        except sqlite3.IntegrityError as ex:
+            raise ValueError(str(ex))
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete one object
+        """
+        self._table(obj.__class__)
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM {} WHERE id = ?"
+                         .format(quote(obj.__class__.__name__)), (obj.id,))
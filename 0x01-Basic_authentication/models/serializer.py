@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+""" Serializer module
+"""
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, TypeVar
+import json
+
+
+def compile_serializer(fields: tuple, timestamps: tuple, fmt: str,
+                       public: bool) -> Callable[[TypeVar('Base')], dict]:
+    """ Generate the to_json function of a model class
+
+    The function reads every declared field directly (no __dict__ walk),
+    skips private fields when `public` is True, and formats `timestamps`
+    through a per-object cache stored in `_cache`: strings are reused
+    until one of the timestamps is replaced.
+    """
+    stamps = [f for f in fields if f in timestamps]
+    n = len(stamps)
+    lines = ["def to_json(self):"]
+    if n > 0:
+        stale = " or ".join("cache[{}] is not self.{}".format(i, f)
+                            for i, f in enumerate(stamps))
+        values = ", ".join("self.{}".format(f) for f in stamps)
+        lines += [
+            "    cache = self._cache",
+            "    if cache is None or {}:".format(stale),
+            "        values = ({},)".format(values),
+            "        cache = self._cache = values + tuple(",
+            "            v.strftime(fmt) if type(v) is datetime else v",
+            "            for v in values)",
+        ]
+    items = []
+    for i, field in enumerate(fields):
+        if public and field[0] == '_':
+            continue
+        if field in stamps:
+            items.append("{!r}: cache[{}]".format(field,
+                                                  n + stamps.index(field)))
+            continue
+        lines += [
+            "    v{} = self.{}".format(i, field),
+            "    if type(v{0}) is datetime:".format(i),
+            "        v{0} = v{0}.strftime(fmt)".format(i),
+        ]
+        items.append("{!r}: v{}".format(field, i))
+    lines.append("    return {{{}}}".format(", ".join(items)))
+
+    namespace = {'datetime': datetime, 'fmt': fmt}
+    exec("\n".join(lines), namespace)
+    return namespace['to_json']
+
+
+def stream_json_array(objs: Iterable[TypeVar('Base')],
+                      batch_size: int = 100) -> Iterator[str]:
+    """ Serialize objects as a JSON array, chunk by chunk, without
+    building the whole list or document in memory
+    """
+    yield "["
+    first = True
+    batch = []
+    for obj in objs:
+        batch.append(json.dumps(obj.to_json(), sort_keys=True,
+                                separators=(",", ":")))
+        if len(batch) >= batch_size:
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ("" if first else ",") + ",".join(batch)
+    yield "]\n"
+
+
+def stream_ndjson(objs: Iterable[TypeVar('Base')],
+                  batch_size: int = 100) -> Iterator[str]:
+    """ Serialize objects as newline-delimited JSON, chunk by chunk
+    """
+    batch = []
+    for obj in objs:
+        batch.append(json.dumps(obj.to_json(), sort_keys=True,
+                                separators=(",", ":")) + "\n")
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
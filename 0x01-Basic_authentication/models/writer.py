@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+""" Writer module
+"""
+from typing import Callable
+import threading
+import time
+
+
+class Writer():
+    """ Group commit of dirty model classes
+
+    Changes are marked with `mark()` and written by `flush()`, either
+    explicitly or from a background thread once `interval` seconds have
+    passed since the first pending change or `max_dirty` changes are
+    pending. When callers wait for their changes, the background thread
+    flushes right away and changes made during a flush are grouped into
+    the next one. `flush_class(cls, records)` writes the pending journal
+    records of one class (an empty list outside of journal mode).
+
+    Inside a `bulk` block, the changes of the thread are held apart from
+    the background flushes, and written when the outermost block ends.
+    """
+
+    def __init__(self, flush_class: Callable[[type, list], None],
+                 interval: float = 0.05, max_dirty: int = 100):
+        """ Initialize a Writer
+        """
+        self.flush_class = flush_class
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self._dirty = {}
+        self._count = 0
+        self._since = None
+        self._started = 0
+        self._completed = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._thread = None
+
+    def mark(self, cls: type, record: dict = None, wait: bool = False):
+        """ Mark a class dirty, optionally with a journal record
+
+        With `wait`, block until a flush started after this call
+        has completed. Inside a `bulk` block, the change is held until
+        the end of the block.
+        """
+        if self.deferred():
+            records = self._local.held.setdefault(cls, [])
+            if record is not None:
+                records.append(record)
+            return
+        with self._cond:
+            records = self._dirty.setdefault(cls, [])
+            if record is not None:
+                records.append(record)
+            self._count += 1
+            if self._since is None:
+                self._since = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            if not wait:
+                return
+            target = self._started + 1
+            self._waiters += 1
+            try:
+                while self._completed < target:
+                    self._cond.wait()
+            finally:
+                self._waiters -= 1
+
+    def _release_held(self):
+        """ Move the changes held by the bulk blocks of the current
+        thread to the dirty classes, `_cond` being held
+        """
+        held = getattr(self._local, 'held', None)
+        if not held:
+            return
+        for cls, records in held.items():
+            self._dirty.setdefault(cls, []).extend(records)
+            self._count += 1
+        self._local.held = {}
+
+    def flush(self):
+        """ Write every dirty class now, with the changes held by the
+        bulk blocks of the current thread
+        """
+        with self._flush_lock:
+            with self._cond:
+                self._release_held()
+                dirty = self._dirty
+                self._dirty = {}
+                self._count = 0
+                self._since = None
+                self._started += 1
+                generation = self._started
+            try:
+                for cls, records in dirty.items():
+                    self.flush_class(cls, records)
+            except Exception:
+                with self._cond:
+                    for cls, records in dirty.items():
+                        pending = self._dirty.setdefault(cls, [])
+                        pending[0:0] = records
+                        self._count += 1
+                    if self._since is None:
+                        self._since = time.monotonic()
+                raise
+            with self._cond:
+                self._completed = generation
+                self._cond.notify_all()
+
+    def deferred(self) -> bool:
+        """ True inside a `bulk()` block of the current thread
+        """
+        return getattr(self._local, 'depth', 0) > 0
+
+    def enter_bulk(self):
+        """ Start deferring writes of the current thread
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            self._local.held = {}
+        self._local.depth = depth + 1
+
+    def exit_bulk(self):
+        """ Stop deferring writes of the current thread, flushing
+        when leaving the outermost block
+        """
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            self.flush()
+
+    def _run(self):
+        """ Background writer loop
+        """
+        while True:
+            with self._cond:
+                while self._since is None:
+                    self._cond.wait()
+                while self._since is not None and self._waiters == 0 \
+                        and self._count < self.max_dirty:
+                    left = self._since + self.interval - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+            try:
+                self.flush()
+            except Exception:
+                # pending changes were requeued, retry after interval
+                time.sleep(self.interval)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+""" Tests of the password hashers of the models
+"""
+import unittest
+
+from models.hashers import BcryptHasher, verify_password
+
+
+@unittest.skipUnless(BcryptHasher().available(), "bcrypt is not installed")
+class TestBcryptHasher(unittest.TestCase):
+    """ Verification against well formed and malformed bcrypt hashes
+    """
+
+    def setUp(self):
+        self.hasher = BcryptHasher(4)
+        self.encoded = self.hasher.encode("secret")
+
+    def test_verify(self):
+        """ The password of a hash matches it, others do not
+        """
+        self.assertTrue(self.hasher.verify("secret", self.encoded))
+        self.assertFalse(self.hasher.verify("wrong", self.encoded))
+
+    def test_malformed_hash(self):
+        """ Truncated, corrupted or non ASCII hashes fail verification
+        """
+        for encoded in (self.encoded[:20], "$2b$", "$2b$04$" + "!" * 53,
+                        self.encoded[:-1] + "é"):
+            self.assertFalse(self.hasher.verify("secret", encoded))
+            self.assertEqual(verify_password("secret", encoded),
+                             (False, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
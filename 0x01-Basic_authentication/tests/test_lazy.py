@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+""" Tests of the lazily built objects of the models
+"""
+import threading
+import time
+import unittest
+
+from models.lazy import LazyObjects
+
+
+class Model():
+    """ Model built from a raw JSON dictionary, slowly enough for other
+    threads to run meanwhile
+    """
+
+    def __init__(self, **kwargs: dict):
+        time.sleep(0)
+        self.id = kwargs.get("id")
+
+
+class TestLazyObjects(unittest.TestCase):
+    """ Snapshots of the objects while request threads build them
+    """
+
+    def setUp(self):
+        self.objs = LazyObjects(Model)
+        for i in range(5000):
+            self.objs.set_raw(str(i), {"id": str(i)})
+
+    def test_raw_items_is_a_copy(self):
+        """ Building an object does not change a taken copy
+        """
+        raw = self.objs.raw_items()
+        self.objs.get("0")
+        self.assertIn("0", raw)
+        self.assertNotIn("0", self.objs.raw_items())
+
+    def test_snapshot_while_building(self):
+        """ raw_items then the built objects list every object once
+        """
+        errors = []
+        done = threading.Event()
+
+        def build(start: int):
+            for i in range(start, 5000, 4):
+                self.objs.get(str(i))
+            done.set()
+
+        def snapshot():
+            try:
+                while not done.is_set():
+                    ids = set(self.objs.raw_items())
+                    ids.update(list(dict.keys(self.objs)))
+                    if len(ids) != 5000:
+                        errors.append(len(ids))
+            except RuntimeError as ex:
+                errors.append(ex)
+        threads = [threading.Thread(target=build, args=(i,))
+                   for i in range(4)]
+        threads.append(threading.Thread(target=snapshot))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.objs.raw_items(), {})
+        self.assertEqual(len(self.objs), 5000)
+
+    def test_concurrent_get(self):
+        """ Threads getting the same object all receive it
+        """
+        results = []
+
+        def get():
+            results.append(self.objs.get("42"))
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(obj is results[0] for obj in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+""" Tests of the group commit writer of the models
+"""
+import threading
+import time
+import unittest
+
+from models.writer import Writer
+
+
+class Model():
+    """ Model class marked dirty
+    """
+
+
+class Recorder():
+    """ flush_class recording what is written, optionally slow
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.flushes = []
+        self.written = []
+        self.lock = threading.Lock()
+
+    def __call__(self, cls: type, records: list):
+        time.sleep(self.delay)
+        with self.lock:
+            self.flushes.append(len(records))
+            self.written.extend(records)
+
+
+class TestWriter(unittest.TestCase):
+    """ Group commit, triggers, failures and bulk blocks
+    """
+
+    def test_wait_returns_once_written(self):
+        """ A waiting mark returns after a flush wrote its record
+        """
+        recorder = Recorder()
+        writer = Writer(recorder, interval=10.0)
+        writer.mark(Model, {"id": 1}, wait=True)
+        self.assertEqual(recorder.written, [{"id": 1}])
+
+    def test_group_commit(self):
+        """ Concurrent waiting marks share flushes, and none is lost
+        """
+        recorder = Recorder(delay=0.01)
+        writer = Writer(recorder, interval=10.0)
+        returned = []
+
+        def save(i: int):
+            writer.mark(Model, {"id": i}, wait=True)
+            with recorder.lock:
+                self.assertIn({"id": i}, recorder.written)
+                returned.append(i)
+        threads = [threading.Thread(target=save, args=(i,))
+                   for i in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(returned), list(range(64)))
+        self.assertEqual(sorted(r["id"] for r in recorder.written),
+                         list(range(64)))
+        self.assertLess(len(recorder.flushes), 64)
+
+    def test_interval(self):
+        """ Pending changes are written once `interval` has passed
+        """
+        recorder = Recorder()
+        writer = Writer(recorder, interval=0.05)
+        writer.mark(Model, {"id": 1})
+        self.assertEqual(recorder.written, [])
+        time.sleep(0.3)
+        self.assertEqual(recorder.written, [{"id": 1}])
+
+    def test_max_dirty(self):
+        """ `max_dirty` pending changes are written before `interval`
+        """
+        recorder = Recorder()
+        writer = Writer(recorder, interval=10.0, max_dirty=5)
+        for i in range(5):
+            writer.mark(Model, {"id": i})
+        time.sleep(0.2)
+        self.assertEqual(len(recorder.written), 5)
+
+    def test_failed_flush_is_retried(self):
+        """ Records of a failed flush are requeued, in order
+        """
+        recorder = Recorder()
+        failures = [True]
+
+        def flush_class(cls: type, records: list):
+            if failures.pop() if failures else False:
+                raise OSError("disk full")
+            recorder(cls, records)
+        writer = Writer(flush_class, interval=10.0)
+        writer.mark(Model, {"id": 1})
+        with self.assertRaises(OSError):
+            writer.flush()
+        writer.mark(Model, {"id": 2})
+        writer.flush()
+        self.assertEqual(recorder.written, [{"id": 1}, {"id": 2}])
+
+    def test_bulk_is_written_at_exit(self):
+        """ Changes of a bulk block skip the background flushes
+        """
+        recorder = Recorder()
+        writer = Writer(recorder, interval=0.01, max_dirty=2)
+        writer.enter_bulk()
+        writer.enter_bulk()
+        for i in range(10):
+            writer.mark(Model, {"id": i})
+        time.sleep(0.1)
+        writer.exit_bulk()
+        self.assertEqual(recorder.written, [])
+        writer.exit_bulk()
+        self.assertEqual(recorder.flushes, [10])
+
+    def test_bulk_of_other_threads(self):
+        """ A bulk block does not hold the changes of other threads
+        """
+        recorder = Recorder()
+        writer = Writer(recorder, interval=10.0)
+        writer.enter_bulk()
+        writer.mark(Model, {"id": "bulk"})
+        other = threading.Thread(
+            target=writer.mark, args=(Model, {"id": "other"}, True))
+        other.start()
+        other.join()
+        self.assertEqual(recorder.written, [{"id": "other"}])
+        writer.exit_bulk()
+        self.assertEqual(recorder.written[-1], {"id": "bulk"})
+
+
+if __name__ == "__main__":
+    unittest.main()
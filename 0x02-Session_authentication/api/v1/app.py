@@ -35,6 +35,20 @@ elif auth_instance == "session_db_auth":
 
     auth = SessionDBAuth()
 
+# paths served without authentication, a trailing * matches any suffix
+EXCLUDED_PATHS = [
+    "/api/v1/status/",
+    "/api/v1/unauthorized/",
+    "/api/v1/forbidden/",
+    "/api/v1/auth_session/login/",
+]
+if getenv("AUTH_EXCLUDED_PATHS"):
+    EXCLUDED_PATHS = [excluded_path.strip() for excluded_path
+                      in getenv("AUTH_EXCLUDED_PATHS").split(",")
+                      if excluded_path.strip()]
+if auth is not None:
+    auth.compile_excluded_paths(EXCLUDED_PATHS)
+
 
 @app.errorhandler(401)
 def unauthorized(error: Exception) -> str:
@@ -60,14 +74,7 @@ def authenticate_user() -> str:
     if auth is None:
         return
 
-    excluded_paths = [
-        "/api/v1/status/",
-        "/api/v1/unauthorized/",
-        "/api/v1/forbidden/",
-        "/api/v1/auth_session/login/",
-    ]
-
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     auth_header = auth.authorization_header(request)
@@ -5,32 +5,34 @@ Auth module for the API
 from os import getenv
 from flask import request
 from typing import List, TypeVar
-import fnmatch
+from api.v1.auth.path_matcher import PathMatcher
 
 
 class Auth:
     """Auth class for the API"""
 
+    _excluded_paths = None
+    _matcher = None
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
-        """Check if auth is required"""
+        """Check if auth is required
+
+        The excluded paths are compiled on the first call, and again only
+        when another list is passed.
+        """
         if path is None or excluded_paths is None or not excluded_paths:
             return True
         if len(path) == 0:
             return True
 
-        slash = True if path[len(path) - 1] == "/" else False
-        tmp_path = path
-        if not slash:
-            tmp_path += "/"
-        for excluded_path in excluded_paths:
-            if excluded_path[len(excluded_path) - 1] != "*":
-                if fnmatch.fnmatch(tmp_path, excluded_path):
-                    return False
-            else:
-                if fnmatch.fnmatch(tmp_path, excluded_path[:-1]):
-                    return False
-
-        return True
+        if excluded_paths is not self._excluded_paths:
+            self.compile_excluded_paths(excluded_paths)
+        return not self._matcher.matches(path)
+
+    def compile_excluded_paths(self, excluded_paths: List[str]):
+        """Compile the excluded paths used by require_auth"""
+        self._matcher = PathMatcher(excluded_paths)
+        self._excluded_paths = excluded_paths
 
     def authorization_header(self, request=None) -> str:
         """Get authorization header"""
@@ -3,19 +3,51 @@
 Basic Auth module for the API
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.principal_cache import PrincipalCache
+from os import getenv
 import re
 import base64
 import binascii
 from typing import Tuple, TypeVar
 
+from models.base import Base
 from models.user import User
 
+try:
+    BASIC_AUTH_CACHE_SIZE = int(getenv("BASIC_AUTH_CACHE_SIZE", 0))
+except ValueError:
+    BASIC_AUTH_CACHE_SIZE = 0
+try:
+    BASIC_AUTH_CACHE_TTL = float(getenv("BASIC_AUTH_CACHE_TTL", 300))
+except ValueError:
+    BASIC_AUTH_CACHE_TTL = 300.0
+
 
 class BasicAuth(Auth):
     """
     BasicAuth class for the API
     """
 
+    def __init__(self):
+        """Initialize the cache of authenticated users, see
+        BASIC_AUTH_CACHE_SIZE"""
+        self.cache = None
+        if BASIC_AUTH_CACHE_SIZE > 0:
+            self.cache = PrincipalCache(BASIC_AUTH_CACHE_SIZE,
+                                        BASIC_AUTH_CACHE_TTL)
+            Base.add_listener(self._on_change)
+
+    def _on_change(self, op: str, obj: Base):
+        """Invalidate the cached headers of a saved or removed user"""
+        if isinstance(obj, User):
+            self.cache.invalidate_user(obj.id)
+
+    def cache_metrics(self) -> dict:
+        """Counters of the cache of authenticated users"""
+        if self.cache is None:
+            return {}
+        return self.cache.metrics()
+
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
         """Extract base64 authorization header"""
@@ -78,6 +110,14 @@ class BasicAuth(Auth):
         if not authoriz_header:
             return None
 
+        if self.cache is not None:
+            cached = self.cache.get(authoriz_header)
+            if cached is not None:
+                user = User.get(cached[0])
+                if user is not None and user.password == cached[1]:
+                    return user
+                self.cache.invalidate(authoriz_header)
+
         b64_encoded = self.extract_base64_authorization_header(authoriz_header)
         if not b64_encoded:
             return None
@@ -90,4 +130,7 @@ class BasicAuth(Auth):
         if not user_email or not user_pwd:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None and self.cache is not None:
+            self.cache.put(authoriz_header, user.id, user.password)
+        return user
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Path matcher module for the API
+"""
+from typing import Iterable
+import fnmatch
+import re
+
+GLOB_CHARS = ("*", "?", "[")
+
+
+def normalize(path: str) -> str:
+    """Path with a trailing slash, so that /a and /a/ are the same"""
+    return path if path.endswith("/") else path + "/"
+
+
+class PathMatcher:
+    """Set of excluded path patterns, compiled once
+
+    - patterns without wildcard are looked up in a set
+    - patterns with a single trailing `*` match any path starting with
+      the rest of the pattern, and are walked in a prefix trie
+    - the other glob patterns are joined in a single regular expression
+
+    Paths and patterns not ending with `*` are compared with a trailing
+    slash.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """Compile the patterns"""
+        self.exact = set()
+        self.trie = {}
+        globs = []
+        for pattern in patterns:
+            if not isinstance(pattern, str) or not pattern:
+                continue
+            head = pattern[:-1]
+            if pattern.endswith("*") and \
+                    not any(c in head for c in GLOB_CHARS):
+                self._add_prefix(head)
+            elif not any(c in pattern for c in GLOB_CHARS):
+                self.exact.add(normalize(pattern))
+            elif pattern.endswith("*"):
+                globs.append(fnmatch.translate(pattern))
+            else:
+                globs.append(fnmatch.translate(normalize(pattern)))
+        self.regex = None
+        if globs:
+            self.regex = re.compile("|".join("(?:{})".format(g)
+                                             for g in globs))
+
+    def _add_prefix(self, prefix: str):
+        """Insert a prefix in the trie, None marks the end of a prefix"""
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    def _match_prefix(self, path: str) -> bool:
+        """Whether a prefix of the trie starts the path"""
+        node = self.trie
+        if None in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+    def matches(self, path: str) -> bool:
+        """Whether a path is matched by one of the patterns"""
+        path = normalize(path)
+        if path in self.exact:
+            return True
+        if self.trie and self._match_prefix(path):
+            return True
+        return self.regex is not None and \
+            self.regex.match(path) is not None
@@ -3,6 +3,7 @@
 Basic Auth module for the API
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import get_session_store
 from typing import Tuple, TypeVar
 from uuid import uuid4
 
@@ -14,6 +15,20 @@ class SessionAuth(Auth):
 
     user_id_by_session_id = {}
 
+    def __init__(self):
+        """Initialize the session store, see SESSION_STORE"""
+        self.store = get_session_store(self.user_id_by_session_id,
+                                       self.session_ttl())
+
+    def session_ttl(self) -> int:
+        """Lifetime of a session in seconds, None if unlimited, 0 to keep
+        it out of the session store"""
+        return None
+
+    def _session_value(self, user_id: str):
+        """Value of a new session in the session store"""
+        return user_id
+
     def create_session(self, user_id: str = None) -> str:
         """Create session id for a user id"""
         if user_id is None:
@@ -21,7 +36,9 @@ class SessionAuth(Auth):
         if not isinstance(user_id, str):
             return None
         session_id = str(uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        ttl = self.session_ttl()
+        if ttl is None or ttl > 0:
+            self.store.set(session_id, self._session_value(user_id), ttl)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -30,7 +47,7 @@ class SessionAuth(Auth):
             return None
         if not isinstance(session_id, str):
             return None
-        return self.user_id_by_session_id.get(session_id)
+        return self.store.get(session_id)
 
     def current_user(self, request=None) -> User:
         """Get user from a request"""
@@ -54,9 +71,5 @@ class SessionAuth(Auth):
         user_id = self.user_id_for_session_id(session_id)
         if not user_id:
             return False
-        try:
-            del self.user_id_by_session_id[session_id]
-        except Exception as ex:
-            pass
-
+        self.store.delete(session_id)
         return True
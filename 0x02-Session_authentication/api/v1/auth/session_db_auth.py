@@ -2,50 +2,137 @@
 """
 Session expire module for the API
 """
-from datetime import datetime, timedelta
-from os import getenv
+from datetime import timezone
+from os import getenv, path
 from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.engine.session_table import SessionTable
 from models.user_session import UserSession
+import os
+import time
+
+# meta key of the session table set once the UserSession model is imported
+USER_SESSIONS_IMPORTED = "user_sessions_imported"
 
 
 class SessionDBAuth(SessionExpAuth):
     """Session Auth Expiration class for the API"""
 
+    def __init__(self):
+        self.cache_ttl = None
+        super().__init__()
+        self.table = SessionTable(getenv("SESSION_DB_PATH",
+                                         ".db_UserSession.sqlite3"))
+        if not self.store.shared:
+            # a logout in another process does not reach this cache
+            try:
+                self.cache_ttl = max(0, int(getenv("SESSION_DB_CACHE_TTL",
+                                                   0)))
+            except ValueError:
+                self.cache_ttl = 0
+        if self.table.get_meta(USER_SESSIONS_IMPORTED) is None:
+            if self.table.count_all() == 0:
+                self.import_user_sessions()
+            else:
+                # imported by a version without the marker
+                self.table.set_meta(USER_SESSIONS_IMPORTED, "")
+
+    def session_ttl(self) -> int:
+        """Lifetime of a session in the session store, at most
+        `cache_ttl` seconds if set"""
+        ttl = super().session_ttl()
+        if self.cache_ttl is None:
+            return ttl
+        return self.cache_ttl if ttl is None else min(ttl, self.cache_ttl)
+
+    def _expires_at(self, created_at: float) -> float:
+        """Expiration timestamp of a session, None if unlimited"""
+        if self.session_duration > 0:
+            return created_at + self.session_duration
+        return None
+
+    def import_user_sessions(self):
+        """Copy the sessions of the UserSession model into the table,
+        once: the import is marked in the table and the file of the model
+        is renamed, so that logged out sessions do not come back"""
+        UserSession.load_from_file()
+        rows = []
+        for user_session in UserSession.all():
+            created_at = user_session.created_at.replace(
+                tzinfo=timezone.utc).timestamp()
+            rows.append((user_session.session_id, user_session.user_id,
+                         created_at, self._expires_at(created_at)))
+        self.table.import_sessions(rows, USER_SESSIONS_IMPORTED)
+        file_path = UserSession._file_path()
+        if path.exists(file_path):
+            os.replace(file_path, file_path + ".imported")
+
     def create_session(self, user_id=None) -> str:
         """Create session id for a user id"""
         session_id = super().create_session(user_id)
         if isinstance(session_id, str):
-            session_dict = {"user_id": user_id, "session_id": session_id}
-            user_session = UserSession(**session_dict)
-            user_session.save()
+            created_at = time.time()
+            self.table.create(session_id, user_id, created_at,
+                              self._expires_at(created_at))
             return session_id
 
     def user_id_for_session_id(self, session_id=None) -> str:
-        """Get user id for a session id"""
-        try:
-            sessions = UserSession.search({"session_id": session_id})
-        except Exception as ex:
-            return None
-
-        if len(sessions) <= 0:
+        """Get user id for a session id, the session store caches
+        the session table: for `cache_ttl` seconds at most when the store
+        is local to the process, not at all if 0"""
+        if not isinstance(session_id, str):
             return None
+        if self.cache_ttl is None:
+            user_id = super().user_id_for_session_id(session_id)
+        elif self.cache_ttl > 0:
+            cached = self.store.get(session_id)
+            user_id = cached.get("user_id") \
+                if isinstance(cached, dict) else None
+        else:
+            user_id = None
+        if user_id is not None:
+            if self.session_sliding and self.session_duration > 0:
+                self.table.touch(session_id, self._expires_at(time.time()))
+            return user_id
 
-        session_span = timedelta(seconds=self.session_duration)
-        session_life = sessions[0].created_at + session_span
-        if session_life < datetime.now():
+        now = time.time()
+        row = self.table.lookup(session_id, now)
+        if row is None:
             return None
-        return sessions[0].user_id
+        user_id, created_at, expires_at = row
+        if self.session_sliding and expires_at is not None:
+            expires_at = self._expires_at(now)
+            self.table.touch(session_id, expires_at)
+        ttl = expires_at - now if expires_at is not None else None
+        if self.cache_ttl is not None:
+            ttl = self.cache_ttl if ttl is None else min(ttl, self.cache_ttl)
+        if ttl is None or ttl > 0:
+            self.store.set(session_id, {"user_id": user_id,
+                                        "created_at": created_at}, ttl)
+        return user_id
 
     def destroy_session(self, request=None) -> bool:
         """Destroy user session / logout"""
         session_id = self.session_cookie(request)
-        try:
-            sessions = UserSession.search({"session_id": session_id})
-        except Exception as ex:
+        if session_id is None:
             return False
+        self.store.delete(session_id)
+        return self.table.delete(session_id)
 
-        if len(sessions) <= 0:
-            return False
+    def destroy_all_sessions(self, user_id: str = None) -> int:
+        """Destroy all the sessions of a user / logout everywhere,
+        return how many"""
+        if not isinstance(user_id, str):
+            return 0
+        session_ids = self.table.delete_user(user_id)
+        pipeline = self.store.pipeline()
+        for session_id in session_ids:
+            pipeline.delete(session_id)
+        pipeline.execute()
+        return len(session_ids)
 
-        sessions[0].remove()
-        return True
+    def session_metrics(self) -> dict:
+        """Counters of the session store and table"""
+        metrics = super().session_metrics()
+        metrics["stored_sessions"] = self.table.count()
+        metrics["purged_sessions"] = self.table.purged
+        return metrics
@@ -2,10 +2,10 @@
 """
 Session expire module for the API
 """
-from datetime import datetime, timedelta
 from os import getenv
 from api.v1.auth.session_auth import SessionAuth
 from models.user import User
+import time
 
 
 class SessionExpAuth(SessionAuth):
@@ -18,27 +18,37 @@ class SessionExpAuth(SessionAuth):
         except Exception as ex:
             session_duration = 0
         self.session_duration = session_duration
+        self.session_sliding = getenv("SESSION_SLIDING", "").lower() in (
+            "1", "true", "yes")
+        super().__init__()
 
-    def create_session(self, user_id=None):
-        """Create session id for a user id"""
-        session_id = super().create_session(user_id)
-        if session_id is None:
-            return None
+    def session_ttl(self) -> int:
+        """Lifetime of a session in seconds, None if unlimited"""
+        if self.session_duration > 0:
+            return self.session_duration
+        return None
 
-        session_dictionary = {"user_id": user_id, "created_at": datetime.now()}
-        self.user_id_by_session_id[session_id] = session_dictionary
-        return session_id
+    def session_metrics(self) -> dict:
+        """Counters of the session store"""
+        return self.store.metrics()
+
+    def _session_value(self, user_id: str) -> dict:
+        """Session dictionary of a new session"""
+        return {"user_id": user_id, "created_at": time.time()}
 
     def user_id_for_session_id(self, session_id=None):
         """Get user id for a session id"""
         if session_id is None:
             return None
 
-        if session_id not in self.user_id_by_session_id:
-            return None
-
-        session_dictionary = self.user_id_by_session_id.get(session_id)
-        if session_dictionary is None:
+        if self.session_sliding and self.session_duration > 0:
+            session_dictionary, _ = self.store.pipeline() \
+                .get(session_id) \
+                .expire(session_id, self.session_duration) \
+                .execute()
+        else:
+            session_dictionary = self.store.get(session_id)
+        if not isinstance(session_dictionary, dict):
             return None
 
         if self.session_duration <= 0:
@@ -47,9 +57,4 @@ class SessionExpAuth(SessionAuth):
         created_at = session_dictionary.get("created_at")
         if created_at is None:
             return None
-
-        session_life = created_at + timedelta(seconds=self.session_duration)
-        if session_life < datetime.now():
-            return None
-
         return session_dictionary.get("user_id")
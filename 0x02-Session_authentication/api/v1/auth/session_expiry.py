@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Session expiry module for the API
+"""
+from collections import deque
+from typing import Hashable, List
+import threading
+import time
+
+
+class TimerWheel:
+    """Hashed timer wheel evicting keys once their deadline has passed
+
+    Keys are stored in the slot of their deadline tick. Advancing the
+    wheel only visits the slots of the elapsed ticks, so each eviction
+    costs amortized O(1). With `size` greater than the longest lifetime
+    in ticks, every key is visited once. Extending a deadline (sliding
+    expiration) only updates it: the key is moved to its new slot when
+    its old slot comes up. A key is in one slot at most.
+    """
+
+    def __init__(self, size: int, resolution: float = 1.0):
+        """Initialize a TimerWheel"""
+        self.size = max(1, size)
+        self.resolution = resolution
+        self.deadlines = {}
+        self.evicted = 0
+        self._slots = {}
+        self._slot_of = {}
+        self._tick = None
+        self._history = deque()
+        self._lock = threading.Lock()
+
+    def _tick_of(self, timestamp: float) -> int:
+        """Tick of a timestamp"""
+        return int(timestamp // self.resolution)
+
+    def _insert(self, key: Hashable, deadline: float):
+        """Store a key in the slot of its deadline"""
+        slot = self._tick_of(deadline) % self.size
+        if self._slot_of.get(key) == slot:
+            return
+        self._slot_of[key] = slot
+        self._slots.setdefault(slot, []).append(key)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Schedule a key, or extend the deadline of a scheduled key"""
+        with self._lock:
+            if key in self.deadlines:
+                self.deadlines[key] = max(self.deadlines[key], deadline)
+                return
+            self.deadlines[key] = deadline
+            self._insert(key, deadline)
+
+    def reschedule(self, key: Hashable, deadline: float):
+        """Schedule a key, or set the deadline of a scheduled key in place:
+        it stays in its slot, and is moved or evicted when the slot comes
+        up"""
+        with self._lock:
+            self.deadlines[key] = deadline
+            if key not in self._slot_of:
+                self._insert(key, deadline)
+
+    def cancel(self, key: Hashable):
+        """Forget a key without counting it as evicted"""
+        with self._lock:
+            self.deadlines.pop(key, None)
+
+    def advance(self, now: float = None) -> List[Hashable]:
+        """Move the wheel to `now`, return the keys that expired"""
+        if now is None:
+            now = time.time()
+        expired = []
+        with self._lock:
+            tick = self._tick_of(now)
+            if self._tick is None:
+                self._tick = tick - 1
+            if tick - self._tick >= len(self._slots):
+                slots = list(self._slots.keys())
+            else:
+                slots = [t % self.size
+                         for t in range(self._tick + 1, tick + 1)]
+            self._tick = tick
+            for slot in slots:
+                keys = self._slots.pop(slot, None)
+                if not keys:
+                    continue
+                for key in keys:
+                    if self._slot_of.get(key) != slot:
+                        # moved to another slot since
+                        continue
+                    del self._slot_of[key]
+                    deadline = self.deadlines.get(key)
+                    if deadline is None:
+                        continue
+                    if deadline <= now:
+                        del self.deadlines[key]
+                        expired.append(key)
+                    else:
+                        self._insert(key, deadline)
+            if expired:
+                self.evicted += len(expired)
+                self._history.append((now, len(expired)))
+            while self._history and self._history[0][0] < now - 60:
+                self._history.popleft()
+        return expired
+
+    def eviction_rate(self, now: float = None) -> float:
+        """Evictions per second over the last minute"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            recent = sum(n for t, n in self._history if t >= now - 60)
+        return recent / 60.0
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Session store module for the API
+"""
+from os import getenv, path
+from typing import Any, List, Tuple
+from urllib.parse import urlparse
+from api.v1.auth.session_expiry import TimerWheel
+import hashlib
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+
+
+class SessionStoreError(Exception):
+    """Error reported by a session store backend"""
+
+
+class Pipeline:
+    """Batch of session store operations run by `execute()`"""
+
+    def __init__(self, store: "SessionStore"):
+        """Initialize a Pipeline"""
+        self.store = store
+        self.ops = []
+
+    def get(self, session_id: str) -> "Pipeline":
+        """Queue a get"""
+        self.ops.append(("get", (session_id,)))
+        return self
+
+    def set(self, session_id: str, value: Any,
+            ttl: int = None) -> "Pipeline":
+        """Queue a set"""
+        self.ops.append(("set", (session_id, value, ttl)))
+        return self
+
+    def expire(self, session_id: str, ttl: int) -> "Pipeline":
+        """Queue an expire"""
+        self.ops.append(("expire", (session_id, ttl)))
+        return self
+
+    def delete(self, session_id: str) -> "Pipeline":
+        """Queue a delete"""
+        self.ops.append(("delete", (session_id,)))
+        return self
+
+    def execute(self) -> List[Any]:
+        """Run the queued operations, return their results in order"""
+        ops = self.ops
+        self.ops = []
+        return self.store.execute_pipeline(ops)
+
+
+class SessionStore:
+    """Key/value store of sessions with optional time-to-live
+
+    Values are anything JSON serializable. A `ttl` is in seconds,
+    None means the session never expires. `shared` stores are seen by
+    all the worker processes.
+    """
+
+    shared = True
+
+    def get(self, session_id: str) -> Any:
+        """Value of a live session, or None"""
+        raise NotImplementedError
+
+    def set(self, session_id: str, value: Any, ttl: int = None) -> bool:
+        """Store a session"""
+        raise NotImplementedError
+
+    def expire(self, session_id: str, ttl: int) -> bool:
+        """Reset the time-to-live of a session, False if it doesn't exist"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session, False if it doesn't exist"""
+        raise NotImplementedError
+
+    def pipeline(self) -> Pipeline:
+        """New pipeline of operations"""
+        return Pipeline(self)
+
+    def execute_pipeline(self, ops: List[Tuple[str, tuple]]) -> List[Any]:
+        """Run pipelined operations, one by one by default"""
+        return [getattr(self, name)(*args) for name, args in ops]
+
+    def metrics(self) -> dict:
+        """Counters of the store"""
+        return {}
+
+
+class MemoryStore(SessionStore):
+    """Sessions in a dict of the process, expired by a timer wheel"""
+
+    shared = False
+
+    def __init__(self, data: dict = None, wheel_size: int = 3601):
+        """Initialize a MemoryStore"""
+        self.data = data if data is not None else {}
+        self.wheel = TimerWheel(wheel_size)
+
+    def _evict(self, now: float):
+        """Drop expired sessions"""
+        for session_id in self.wheel.advance(now):
+            self.data.pop(session_id, None)
+
+    def get(self, session_id: str) -> Any:
+        """Value of a live session, or None"""
+        now = time.time()
+        self._evict(now)
+        deadline = self.wheel.deadlines.get(session_id)
+        if deadline is not None and deadline <= now:
+            return None
+        return self.data.get(session_id)
+
+    def set(self, session_id: str, value: Any, ttl: int = None) -> bool:
+        """Store a session"""
+        now = time.time()
+        self._evict(now)
+        self.data[session_id] = value
+        if ttl is None:
+            self.wheel.cancel(session_id)
+        else:
+            self.wheel.reschedule(session_id, now + ttl)
+        return True
+
+    def expire(self, session_id: str, ttl: int) -> bool:
+        """Reset the time-to-live of a session"""
+        if self.get(session_id) is None:
+            return False
+        self.wheel.reschedule(session_id, time.time() + ttl)
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session"""
+        self.wheel.cancel(session_id)
+        return self.data.pop(session_id, None) is not None
+
+    def metrics(self) -> dict:
+        """Live session count and eviction counters"""
+        self._evict(time.time())
+        return {
+            "live_sessions": len(self.data),
+            "evicted_sessions": self.wheel.evicted,
+            "evictions_per_second": self.wheel.eviction_rate(),
+        }
+
+
+class FileStore(SessionStore):
+    """Sessions in one JSON file each, shared by all processes"""
+
+    def __init__(self, dir_path: str = ".sessions", sweep_every: int = 1000):
+        """Initialize a FileStore"""
+        self.dir_path = dir_path
+        self.sweep_every = sweep_every
+        self._writes = 0
+        os.makedirs(dir_path, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        """File of a session, named after a digest of its ID"""
+        digest = hashlib.sha1(str(session_id).encode()).hexdigest()
+        return path.join(self.dir_path, digest + ".json")
+
+    def _read(self, file_path: str) -> dict:
+        """Record of a live session, or None"""
+        try:
+            with open(file_path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        expires_at = record.get("expires_at")
+        if expires_at is not None and expires_at <= time.time():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            return None
+        return record
+
+    def _write(self, file_path: str, record: dict):
+        """Write a record atomically"""
+        tmp_path = "{}.tmp.{}.{}".format(file_path, os.getpid(),
+                                         threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, file_path)
+
+    def get(self, session_id: str) -> Any:
+        """Value of a live session, or None"""
+        record = self._read(self._path(session_id))
+        return record.get("value") if record is not None else None
+
+    def set(self, session_id: str, value: Any, ttl: int = None) -> bool:
+        """Store a session"""
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._write(self._path(session_id),
+                    {"value": value, "expires_at": expires_at})
+        self._writes += 1
+        if self.sweep_every > 0 and self._writes % self.sweep_every == 0:
+            self.sweep()
+        return True
+
+    def expire(self, session_id: str, ttl: int) -> bool:
+        """Reset the time-to-live of a session"""
+        file_path = self._path(session_id)
+        record = self._read(file_path)
+        if record is None:
+            return False
+        record["expires_at"] = time.time() + ttl
+        self._write(file_path, record)
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session"""
+        try:
+            os.remove(self._path(session_id))
+            return True
+        except OSError:
+            return False
+
+    def sweep(self):
+        """Delete the files of expired sessions"""
+        for name in os.listdir(self.dir_path):
+            if name.endswith(".json"):
+                self._read(path.join(self.dir_path, name))
+
+    def metrics(self) -> dict:
+        """Number of session files"""
+        return {"live_sessions": len([n for n in os.listdir(self.dir_path)
+                                      if n.endswith(".json")])}
+
+
+class SQLiteStore(SessionStore):
+    """Sessions in a SQLite table, shared by all processes"""
+
+    def __init__(self, db_path: str = ".db_sessions.sqlite3",
+                 sweep_every: int = 1000):
+        """Initialize a SQLiteStore"""
+        self.db_path = db_path
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                     "session_id TEXT PRIMARY KEY, value TEXT, "
+                     "expires_at REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at "
+                     "ON sessions (expires_at)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, conn: sqlite3.Connection, session_id: str) -> Any:
+        """get() on a connection"""
+        row = conn.execute(
+            "SELECT value FROM sessions WHERE session_id = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time())).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _set(self, conn: sqlite3.Connection, session_id: str, value: Any,
+             ttl: int = None) -> bool:
+        """set() on a connection"""
+        expires_at = time.time() + ttl if ttl is not None else None
+        conn.execute(
+            "INSERT INTO sessions (session_id, value, expires_at) "
+            "VALUES (?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+            "value = excluded.value, expires_at = excluded.expires_at",
+            (session_id, json.dumps(value), expires_at))
+        self._writes += 1
+        if self.sweep_every > 0 and self._writes % self.sweep_every == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?",
+                         (time.time(),))
+        return True
+
+    def _expire(self, conn: sqlite3.Connection, session_id: str,
+                ttl: int) -> bool:
+        """expire() on a connection"""
+        cursor = conn.execute(
+            "UPDATE sessions SET expires_at = ? WHERE session_id = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (time.time() + ttl, session_id, time.time()))
+        return cursor.rowcount > 0
+
+    def _delete(self, conn: sqlite3.Connection, session_id: str) -> bool:
+        """delete() on a connection"""
+        cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?",
+                              (session_id,))
+        return cursor.rowcount > 0
+
+    def get(self, session_id: str) -> Any:
+        """Value of a live session, or None"""
+        return self._get(self._connection(), session_id)
+
+    def set(self, session_id: str, value: Any, ttl: int = None) -> bool:
+        """Store a session"""
+        conn = self._connection()
+        with conn:
+            return self._set(conn, session_id, value, ttl)
+
+    def expire(self, session_id: str, ttl: int) -> bool:
+        """Reset the time-to-live of a session"""
+        conn = self._connection()
+        with conn:
+            return self._expire(conn, session_id, ttl)
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session"""
+        conn = self._connection()
+        with conn:
+            return self._delete(conn, session_id)
+
+    def execute_pipeline(self, ops: List[Tuple[str, tuple]]) -> List[Any]:
+        """Run pipelined operations in a single transaction"""
+        conn = self._connection()
+        with conn:
+            return [getattr(self, "_" + name)(conn, *args)
+                    for name, args in ops]
+
+    def metrics(self) -> dict:
+        """Number of live sessions"""
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at IS NULL "
+            "OR expires_at > ?", (time.time(),)).fetchone()
+        return {"live_sessions": row[0]}
+
+
+class RedisConnection:
+    """One connection speaking the Redis wire protocol (RESP)"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        """Open a connection"""
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        """Encode one command"""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def send(self, commands: List[tuple]):
+        """Send commands in a single write"""
+        self.sock.sendall(b"".join(self.encode(*c) for c in commands))
+
+    def read_reply(self) -> Any:
+        """Read one reply"""
+        line = self.rfile.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by the server")
+        kind, data = line[:1], line[1:-2]
+        if kind == b"+":
+            return data.decode("utf-8")
+        if kind == b"-":
+            return SessionStoreError(data.decode("utf-8"))
+        if kind == b":":
+            return int(data)
+        if kind == b"$":
+            size = int(data)
+            if size < 0:
+                return None
+            payload = self.rfile.read(size + 2)
+            return payload[:-2]
+        if kind == b"*":
+            size = int(data)
+            if size < 0:
+                return None
+            return [self.read_reply() for _ in range(size)]
+        raise SessionStoreError("unexpected reply {!r}".format(line))
+
+    def close(self):
+        """Close the connection"""
+        try:
+            self.rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisStore(SessionStore):
+    """Sessions in a server speaking the Redis wire protocol
+
+    Connections are kept in a bounded pool and pipelines are sent in a
+    single round trip.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0",
+                 pool_size: int = 8, timeout: float = 2.0,
+                 prefix: str = "session:"):
+        """Initialize a RedisStore"""
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout
+        self.prefix = prefix
+        self._pool = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> RedisConnection:
+        """Open and set up a new connection"""
+        conn = RedisConnection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            conn.send(setup)
+            for _ in setup:
+                reply = conn.read_reply()
+                if isinstance(reply, SessionStoreError):
+                    conn.close()
+                    raise reply
+        return conn
+
+    def _execute(self, commands: List[tuple]) -> List[Any]:
+        """Send commands on a pooled connection, return their replies"""
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            conn.send(commands)
+            replies = [conn.read_reply() for _ in commands]
+        except (OSError, ConnectionError) as ex:
+            if conn is not None:
+                conn.close()
+            raise SessionStoreError(str(ex))
+        except Exception:
+            # out of sync with the server, e.g. a malformed reply
+            if conn is not None:
+                conn.close()
+            raise
+        else:
+            self._pool.put(conn)
+        finally:
+            self._slots.release()
+        for reply in replies:
+            if isinstance(reply, SessionStoreError):
+                raise reply
+        return replies
+
+    def _command(self, name: str, args: tuple) -> tuple:
+        """Redis command of a store operation"""
+        key = self.prefix + str(args[0])
+        if name == "get":
+            return ("GET", key)
+        if name == "set":
+            value, ttl = json.dumps(args[1]), args[2]
+            if ttl is None:
+                return ("SET", key, value)
+            return ("SET", key, value, "EX", max(1, int(ttl)))
+        if name == "expire":
+            return ("EXPIRE", key, max(1, int(args[1])))
+        return ("DEL", key)
+
+    @staticmethod
+    def _result(name: str, reply: Any) -> Any:
+        """Store result of a Redis reply"""
+        if name == "get":
+            return json.loads(reply) if reply is not None else None
+        if name == "set":
+            return reply == "OK"
+        return reply == 1
+
+    def execute_pipeline(self, ops: List[Tuple[str, tuple]]) -> List[Any]:
+        """Run pipelined operations in a single round trip"""
+        if not ops:
+            return []
+        replies = self._execute([self._command(name, args)
+                                 for name, args in ops])
+        return [self._result(name, reply)
+                for (name, _), reply in zip(ops, replies)]
+
+    def get(self, session_id: str) -> Any:
+        """Value of a live session, or None"""
+        return self.execute_pipeline([("get", (session_id,))])[0]
+
+    def set(self, session_id: str, value: Any, ttl: int = None) -> bool:
+        """Store a session"""
+        return self.execute_pipeline([("set", (session_id, value, ttl))])[0]
+
+    def expire(self, session_id: str, ttl: int) -> bool:
+        """Reset the time-to-live of a session"""
+        return self.execute_pipeline([("expire", (session_id, ttl))])[0]
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session"""
+        return self.execute_pipeline([("delete", (session_id,))])[0]
+
+
+def get_session_store(data: dict = None, max_ttl: int = None) -> SessionStore:
+    """Session store selected by SESSION_STORE: memory (default), file,
+    sqlite or redis
+
+    `data` backs the memory store, `max_ttl` sizes its timer wheel.
+    """
+    store_type = getenv("SESSION_STORE", "memory").lower()
+    if store_type == "file":
+        return FileStore(getenv("SESSION_STORE_PATH", ".sessions"))
+    if store_type == "sqlite":
+        return SQLiteStore(getenv("SESSION_STORE_PATH",
+                                  ".db_sessions.sqlite3"))
+    if store_type == "redis":
+        try:
+            pool_size = int(getenv("SESSION_STORE_POOL_SIZE", 8))
+        except ValueError:
+            pool_size = 8
+        return RedisStore(getenv("SESSION_STORE_URL",
+                                 "redis://localhost:6379/0"), pool_size)
+    wheel_size = max_ttl + 1 if max_ttl is not None and max_ttl > 0 else 3601
+    return MemoryStore(data, wheel_size)
@@ -51,3 +51,20 @@ def session_logout():
     if not deleted_session:
         abort(404)
     return jsonify({}), 200
+
+
+@app_views.route("/auth_session/logout_all",
+                 methods=["DELETE"], strict_slashes=False)
+def session_logout_all():
+    """DELETE /api/v1/auth_session/logout_all
+    Return:
+      - number of closed sessions of the current user with status code
+        200 if successful, otherwise abort with status code 404
+    """
+    from api.v1.app import auth
+
+    user = getattr(request, "current_user", None)
+    if user is None or not hasattr(auth, "destroy_all_sessions"):
+        abort(404)
+    closed = auth.destroy_all_sessions(user.id)
+    return jsonify({"closed_sessions": closed}), 200
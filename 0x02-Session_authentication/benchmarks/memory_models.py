@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Memory footprint of User and UserSession objects
+
+Compares the slotted models with an equivalent __dict__-based layout
+(the layout of the models before __slots__).
+
+    $ python3 -m benchmarks.memory_models [count]
+"""
+from datetime import datetime
+import sys
+import tracemalloc
+import uuid
+
+from models.user import User
+from models.user_session import UserSession
+
+
+class DictUser():
+    """ User with a per-instance __dict__
+    """
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        self.email = "bob@hbtn.io"
+        self._password = "x" * 64
+        self.first_name = None
+        self.last_name = None
+
+
+class DictUserSession():
+    """ UserSession with a per-instance __dict__
+    """
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        self.user_id = str(uuid.uuid4())
+        self.session_id = str(uuid.uuid4())
+
+
+def new_user() -> User:
+    """ Slotted User with the same values as DictUser
+    """
+    user = User()
+    user.email = "bob@hbtn.io"
+    user._password = "x" * 64
+    return user
+
+
+def new_session() -> UserSession:
+    """ Slotted UserSession with the same values as DictUserSession
+    """
+    return UserSession(user_id=str(uuid.uuid4()),
+                       session_id=str(uuid.uuid4()))
+
+
+def bytes_per_object(factory, count: int) -> float:
+    """ Average memory allocated per object
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / count
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, legacy, slotted in (("User", DictUser, new_user),
+                                  ("UserSession", DictUserSession,
+                                   new_session)):
+        old = bytes_per_object(legacy, count)
+        new = bytes_per_object(slotted, count)
+        print("{}: {:.0f} bytes/object with __dict__, {:.0f} with "
+              "__slots__ ({:.0%})".format(name, old, new, new / old))
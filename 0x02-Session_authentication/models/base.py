@@ -1,37 +1,106 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from contextlib import contextmanager
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import Callable, TypeVar, List, Iterable, Iterator
+from os import getenv, path
+import atexit
+import bisect
+import threading
 import uuid
 
+from models.codec import get_codec, parse_timestamp
+from models.journal import Journal, write_atomic
+from models.lazy import LazyObjects
+from models.serializer import compile_serializer
+from models.writer import Writer
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+FIELDS = {}
+SERIALIZERS = {}
+INDEXES = {}
+INDEX_KEYS = {}
+ORDERED = {}
+JOURNALS = {}
+LISTENERS = []
+FILE_LOCK = threading.Lock()
+
+CODEC = get_codec(getenv("MODELS_CODEC"))
+LAZY_LOAD = getenv("MODELS_LAZY", "").lower() in ("1", "true", "yes")
+
+# storage engine replacing the in-memory DATA and .db_<Class>.json files
+STORAGE = None
+storage_type = getenv("MODELS_STORAGE", "file").lower()
+if storage_type == "sharded":
+    from models.engine.sharded_storage import ShardedStorage
+
+    try:
+        STORAGE = ShardedStorage(int(getenv("MODELS_SHARDS", 16)))
+    except ValueError:
+        STORAGE = ShardedStorage()
+elif storage_type == "sqlite":
+    from models.engine.sqlite_storage import SQLiteStorage
+
+    STORAGE = SQLiteStorage(getenv("MODELS_SQLITE_PATH",
+                                   ".db_models.sqlite3"))
+
+JOURNAL_MODE = getenv("MODELS_JOURNAL", "").lower() in ("1", "true", "yes")
+try:
+    JOURNAL_COMPACT_EVERY = int(getenv("MODELS_JOURNAL_COMPACT_EVERY", 1000))
+except ValueError:
+    JOURNAL_COMPACT_EVERY = 1000
+
+# sync: write before save() returns
+# batched: save() waits for the next group commit
+# async: save() returns at once, the background writer catches up
+DURABILITY = getenv("MODELS_DURABILITY", "sync").lower()
+try:
+    FLUSH_INTERVAL = float(getenv("MODELS_FLUSH_INTERVAL", 0.05))
+except ValueError:
+    FLUSH_INTERVAL = 0.05
+try:
+    FLUSH_MAX_DIRTY = int(getenv("MODELS_FLUSH_MAX_DIRTY", 100))
+except ValueError:
+    FLUSH_MAX_DIRTY = 100
 
 
 class Base():
     """ Base class
+
+    Subclasses declare their attributes in `__slots__`, so objects carry
+    no per-instance `__dict__`. They can declare secondary indexes with
+    `__indexes__` (tuple of attribute names) and unique constraints with
+    `__unique__`. Indexes reflect the state of objects as of their last
+    `save()`.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at', '_cache')
+    __timestamps__ = ('created_at', 'updated_at')
+    __indexes__ = ()
+    __unique__ = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+            INDEXES[s_class] = {}
+            INDEX_KEYS[s_class] = {}
 
+        self._cache = None
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'),
+                                              TIMESTAMP_FORMAT)
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'),
+                                              TIMESTAMP_FORMAT)
         else:
             self.updated_at = datetime.utcnow()
 
@@ -44,11 +113,53 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def _fields(cls) -> tuple:
+        """ Attributes declared in the __slots__ of the class and its
+        parents, in declaration order
+        """
+        fields = FIELDS.get(cls)
+        if fields is None:
+            fields = []
+            for klass in reversed(cls.__mro__):
+                slots = klass.__dict__.get('__slots__', ())
+                if type(slots) is str:
+                    slots = (slots,)
+                fields.extend(f for f in slots if f not in fields
+                              and f not in ('_cache', '__dict__',
+                                            '__weakref__'))
+            fields = tuple(fields)
+            FIELDS[cls] = fields
+        return fields
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        cls = self.__class__
+        serializer = SERIALIZERS.get((cls, for_serialization))
+        if serializer is None:
+            serializer = False
+            if cls.__dictoffset__ == 0:
+                # only fully slotted classes have a fixed set of fields
+                serializer = compile_serializer(cls._fields(),
+                                                cls.__timestamps__,
+                                                TIMESTAMP_FORMAT,
+                                                not for_serialization)
+            SERIALIZERS[(cls, for_serialization)] = serializer
+        if serializer:
+            try:
+                return serializer(self)
+            except AttributeError:
+                # some declared attribute isn't set
+                pass
+
         result = {}
-        for key, value in self.__dict__.items():
+        items = [(key, getattr(self, key)) for key in self.__class__._fields()
+                 if hasattr(self, key)]
+        if hasattr(self, '__dict__'):
+            # subclass without __slots__
+            items.extend(self.__dict__.items())
+        for key, value in items:
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -58,55 +169,285 @@ class Base():
         return result
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def _file_path(cls) -> str:
+        """ Path of the snapshot file of the class
+        """
+        return ".db_{}.{}".format(cls.__name__, CODEC.extension)
+
+    @classmethod
+    def _load_one(cls, obj_id: str, obj_json: dict):
+        """ Store one object read from file or journal
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        if LAZY_LOAD:
+            DATA[s_class].set_raw(obj_id, obj_json)
+            cls._reindex(obj_id, cls._index_keys(obj_json))
+        else:
+            obj = cls(**obj_json)
+            DATA[s_class][obj_id] = obj
+            cls._reindex(obj_id, cls._index_keys(obj))
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
+    @classmethod
+    def load_from_file(cls):
+        """ Load all objects from file, then replay the journal
+
+        With MODELS_LAZY, objects are kept as raw JSON dictionaries
+        and only built when first accessed.
+        """
+        if STORAGE is not None:
+            STORAGE.load(cls)
+            return
+        s_class = cls.__name__
+        file_path = cls._file_path()
+        DATA[s_class] = LazyObjects(cls) if LAZY_LOAD else {}
+        ORDERED[s_class] = None
+        INDEXES[s_class] = {}
+        INDEX_KEYS[s_class] = {}
+        if path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                objs_json = CODEC.loads(f.read())
             for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+                cls._load_one(obj_id, obj_json)
+
+        journal = cls._journal()
+        if not JOURNAL_MODE and not journal.exists():
+            return
+        for record in journal.replay():
+            obj_id = record.get('id')
+            if record.get('op') == 'remove':
+                DATA[s_class].pop(obj_id, None)
+                cls._reindex(obj_id)
+            else:
+                cls._load_one(obj_id, record.get('obj'))
+        if not JOURNAL_MODE or journal.needs_recovery():
+            journal.compact()
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
+        if STORAGE is not None:
+            return
+        if JOURNAL_MODE:
+            cls._journal().compact()
+            return
+        with FILE_LOCK:
+            write_atomic(cls._file_path(),
+                         CODEC.dumps(cls._serialize_all()))
+
+    @classmethod
+    def _serialize_all(cls) -> dict:
+        """ JSON dictionaries of all objects, by ID
+        """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
+        objs = DATA[s_class]
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
+        if isinstance(objs, LazyObjects):
+            # objects never built are still in their serialized form
+            objs_json.update(objs.raw_items())
+        for obj_id, obj in list(dict.items(objs)):
             objs_json[obj_id] = obj.to_json(True)
+        return objs_json
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def _journal(cls) -> Journal:
+        """ Journal of the class, created on first use
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(cls._file_path(),
+                                        ".db_{}.journal".format(s_class),
+                                        cls._serialize_all,
+                                        JOURNAL_COMPACT_EVERY,
+                                        CODEC.dumps)
+        return JOURNALS[s_class]
+
+    @classmethod
+    def _persist(cls, record: dict = None):
+        """ Write one change of the class according to DURABILITY
+        """
+        if DURABILITY == 'sync' and not WRITER.deferred():
+            cls._flush_class(cls, [record] if record is not None else [])
+            return
+        wait = DURABILITY == 'batched' and not WRITER.deferred()
+        WRITER.mark(cls, record, wait)
+
+    @staticmethod
+    def _flush_class(cls, records: List[dict]):
+        """ Write pending changes of one class
+        """
+        if JOURNAL_MODE:
+            cls._journal().append_many(records)
+        else:
+            cls.save_to_file()
+
+    @staticmethod
+    def add_listener(listener: Callable[[str, TypeVar('Base')], None]):
+        """ Call `listener(op, obj)` after each `save()` ('save') and
+        `remove()` ('remove') of any object
+        """
+        LISTENERS.append(listener)
+
+    def _notify(self, op: str):
+        """ Call the listeners of changes
+        """
+        for listener in LISTENERS:
+            listener(op, self)
+
+    @staticmethod
+    def flush():
+        """ Write all pending changes now
+        """
+        WRITER.flush()
+
+    @staticmethod
+    @contextmanager
+    def bulk():
+        """ Defer writes of the current thread until the end of the
+        block, e.g. for mass imports:
+
+            with Base.bulk():
+                for row in rows:
+                    User(**row).save()
+        """
+        WRITER.enter_bulk()
+        try:
+            yield
+        finally:
+            WRITER.exit_bulk()
+
+    @classmethod
+    def _indexed_attributes(cls) -> tuple:
+        """ Attributes covered by a secondary index
+        """
+        attrs = tuple(cls.__indexes__)
+        return attrs + tuple(a for a in cls.__unique__ if a not in attrs)
+
+    @classmethod
+    def _index_keys(cls, obj) -> dict:
+        """ Indexed values of an object or of its raw JSON dictionary
+        """
+        if isinstance(obj, dict):
+            return {attr: obj.get(attr) for attr in cls._indexed_attributes()}
+        return {attr: getattr(obj, attr, None)
+                for attr in cls._indexed_attributes()}
+
+    @classmethod
+    def _reindex(cls, obj_id: str, keys: dict = None):
+        """ Update secondary indexes for one object from its indexed
+        values (drop it if keys is None)
+        """
+        s_class = cls.__name__
+        indexes = INDEXES[s_class]
+        old_keys = INDEX_KEYS[s_class].pop(obj_id, {})
+        new_keys = keys if keys is not None else {}
+
+        for attr, value in old_keys.items():
+            if attr in new_keys and new_keys[attr] == value:
+                continue
+            index = indexes.get(attr)
+            if index is None or value not in index:
+                continue
+            del index[value][obj_id]
+            if len(index[value]) == 0:
+                del index[value]
+
+        for attr, value in new_keys.items():
+            if attr in old_keys and old_keys[attr] == value:
+                continue
+            if attr not in indexes:
+                indexes[attr] = {}
+            index = indexes[attr]
+            if index is None:
+                continue
+            try:
+                index.setdefault(value, {})[obj_id] = None
+            except TypeError:
+                # unhashable value: this index can't be trusted anymore
+                indexes[attr] = None
+
+        if keys is not None:
+            INDEX_KEYS[s_class][obj_id] = new_keys
+
+    @classmethod
+    def _lookup(cls, attributes: dict) -> Iterable[str]:
+        """ Candidate IDs from the most selective index covering
+        the query, or None if no index can be used
+        """
+        s_class = cls.__name__
+        best = None
+        for attr, value in attributes.items():
+            index = INDEXES[s_class].get(attr)
+            if index is None:
+                continue
+            try:
+                ids = index.get(value, {})
+            except TypeError:
+                continue
+            if best is None or len(ids) < len(best):
+                best = ids
+        return best
+
+    def _check_unique(self):
+        """ Raise a ValueError if a unique attribute is already used
+        """
+        for attr in self.__class__.__unique__:
+            value = getattr(self, attr, None)
+            if value is None:
+                continue
+            others = self.__class__.search({attr: value})
+            if any(obj.id != self.id for obj in others):
+                raise ValueError("{} {} already exists".format(attr, value))
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
+        self._check_unique()
         self.updated_at = datetime.utcnow()
+        self._cache = None
+        if STORAGE is not None:
+            STORAGE.save(self)
+            self._notify('save')
+            return
+        ordered = ORDERED.get(s_class)
+        if ordered is not None and self.id not in DATA[s_class]:
+            bisect.insort(ordered, self.id)
         DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__._reindex(self.id, self.__class__._index_keys(self))
+        self.__class__._persist(
+            {'op': 'save', 'id': self.id, 'obj': self.to_json(True)}
+            if JOURNAL_MODE else None)
+        self._notify('save')
 
     def remove(self):
         """ Remove object
         """
+        if STORAGE is not None:
+            STORAGE.remove(self)
+            self._notify('remove')
+            return
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            ordered = ORDERED.get(s_class)
+            if ordered is not None:
+                i = bisect.bisect_left(ordered, self.id)
+                if i < len(ordered) and ordered[i] == self.id:
+                    del ordered[i]
+            self.__class__._reindex(self.id)
+            self.__class__._persist(
+                {'op': 'remove', 'id': self.id} if JOURNAL_MODE else None)
+        self._notify('remove')
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        if STORAGE is not None:
+            return STORAGE.count(cls)
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(DATA[s_class])
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,10 +455,48 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Objects ordered by ID, starting after the ID `after`
+        (cursor of the previous page), at most `limit` of them
+        """
+        if STORAGE is not None:
+            return STORAGE.page(cls, after, limit)
+        s_class = cls.__name__
+        ordered = ORDERED.get(s_class)
+        if ordered is None:
+            objs = DATA[s_class]
+            ids = set()
+            if isinstance(objs, LazyObjects):
+                # raw first: an object built meanwhile is then listed
+                # twice rather than missed
+                ids.update(objs.raw_items().keys())
+            ids.update(list(dict.keys(objs)))
+            ordered = ORDERED[s_class] = sorted(ids)
+        start = 0 if after is None else bisect.bisect_right(ordered, after)
+        end = len(ordered) if limit is None else start + limit
+        return [DATA[s_class][obj_id] for obj_id in ordered[start:end]]
+
+    @classmethod
+    def iterate(cls, after: str = None,
+                batch_size: int = 500) -> Iterator[TypeVar('Base')]:
+        """ Iterate over objects ordered by ID, one page at a time
+        """
+        while True:
+            objs = cls.page(after, batch_size)
+            for obj in objs:
+                yield obj
+            if len(objs) < batch_size:
+                return
+            after = objs[-1].id
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        if STORAGE is not None:
+            return STORAGE.get(cls, id)
         s_class = cls.__name__
         return DATA[s_class].get(id)
 
@@ -125,6 +504,8 @@ class Base():
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        if STORAGE is not None:
+            return STORAGE.search(cls, attributes)
         s_class = cls.__name__
         def _search(obj):
             if len(attributes) == 0:
@@ -133,5 +514,14 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        ids = cls._lookup(attributes)
+        if ids is not None:
+            objs = [DATA[s_class][obj_id] for obj_id in ids]
+        else:
+            objs = DATA[s_class].values()
+        return list(filter(_search, objs))
+
+
+WRITER = Writer(Base._flush_class, FLUSH_INTERVAL, FLUSH_MAX_DIRTY)
+atexit.register(WRITER.flush)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+""" Session table module
+"""
+from typing import Iterable, List, Tuple
+import sqlite3
+import threading
+import time
+
+
+class SessionTable():
+    """ Persistent sessions, in a SQLite table clustered on `session_id`
+
+    A session is validated by one primary key lookup, `user_id` has a
+    secondary index to close all the sessions of a user, and `expires_at`
+    has an index so that expired sessions are deleted in bulk, as one
+    range of the index, at most every `purge_interval` seconds.
+    """
+
+    def __init__(self, db_path: str = ".db_UserSession.sqlite3",
+                 purge_interval: float = 60.0):
+        """ Initialize a SessionTable
+        """
+        self.db_path = db_path
+        self.purge_interval = purge_interval
+        self.purged = 0
+        self._next_purge = 0.0
+        self._local = threading.local()
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS user_sessions ("
+                         "session_id TEXT PRIMARY KEY, "
+                         "user_id TEXT NOT NULL, "
+                         "created_at REAL NOT NULL, "
+                         "expires_at REAL) WITHOUT ROWID")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_user_sessions_user_id "
+                         "ON user_sessions (user_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS "
+                         "ix_user_sessions_expires_at "
+                         "ON user_sessions (expires_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS session_meta ("
+                         "key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0,
+                                   cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id: str, user_id: str, created_at: float,
+               expires_at: float = None):
+        """ Store a new session, `expires_at` None never expires
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO user_sessions "
+                         "(session_id, user_id, created_at, expires_at) "
+                         "VALUES (?, ?, ?, ?)",
+                         (session_id, user_id, created_at, expires_at))
+        self.purge_expired()
+
+    def import_sessions(self, rows: Iterable[Tuple[str, str, float, float]],
+                        marker: str = None):
+        """ Store many sessions (session_id, user_id, created_at,
+        expires_at) in one transaction, keep existing ones
+
+        `marker`, if set, is recorded in the same transaction, so that
+        `get_meta(marker)` tells whether the import was done.
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO user_sessions "
+                             "(session_id, user_id, created_at, expires_at) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            if marker is not None:
+                conn.execute("INSERT OR REPLACE INTO session_meta "
+                             "(key, value) VALUES (?, ?)",
+                             (marker, str(time.time())))
+
+    def get_meta(self, key: str) -> str:
+        """ Value of a meta key, or None
+        """
+        row = self._connection().execute(
+            "SELECT value FROM session_meta WHERE key = ?",
+            (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key: str, value: str):
+        """ Set a meta key
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO session_meta (key, value) "
+                         "VALUES (?, ?)", (key, value))
+
+    def lookup(self, session_id: str,
+               now: float = None) -> Tuple[str, float, float]:
+        """ (user_id, created_at, expires_at) of a live session, or None
+        """
+        if now is None:
+            now = time.time()
+        row = self._connection().execute(
+            "SELECT user_id, created_at, expires_at FROM user_sessions "
+            "WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or (row[2] is not None and row[2] <= now):
+            return None
+        return row
+
+    def touch(self, session_id: str, expires_at: float) -> bool:
+        """ Move the expiration of a session
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("UPDATE user_sessions SET expires_at = ? "
+                                  "WHERE session_id = ?",
+                                  (expires_at, session_id))
+        return cursor.rowcount > 0
+
+    def delete(self, session_id: str) -> bool:
+        """ Delete a session
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM user_sessions "
+                                  "WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def delete_user(self, user_id: str) -> List[str]:
+        """ Delete all the sessions of a user, return their IDs
+        """
+        conn = self._connection()
+        with conn:
+            session_ids = [row[0] for row in conn.execute(
+                "SELECT session_id FROM user_sessions WHERE user_id = ?",
+                (user_id,))]
+            conn.execute("DELETE FROM user_sessions WHERE user_id = ?",
+                         (user_id,))
+        return session_ids
+
+    def purge_expired(self, now: float = None, force: bool = False) -> int:
+        """ Delete the expired sessions, return how many
+        """
+        if now is None:
+            now = time.time()
+        if not force and now < self._next_purge:
+            return 0
+        self._next_purge = now + self.purge_interval
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM user_sessions "
+                                  "WHERE expires_at <= ?", (now,))
+        self.purged += cursor.rowcount
+        return cursor.rowcount
+
+    def count(self, now: float = None) -> int:
+        """ Number of live sessions
+        """
+        if now is None:
+            now = time.time()
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM user_sessions "
+            "WHERE expires_at IS NULL OR expires_at > ?", (now,)).fetchone()
+        return row[0]
+
+    def count_all(self) -> int:
+        """ Number of sessions, expired ones included
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM user_sessions").fetchone()[0]
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+""" Sharded storage module
+"""
+from typing import TypeVar, List, Iterator
+from os import path
+import bisect
+import fcntl
+import heapq
+import itertools
+import json
+import mmap
+import os
+import threading
+import zlib
+
+
+class Shard():
+    """ One shard file of a model class: one JSON record per line,
+    read through mmap. Only the offsets of the records and the indexed
+    values are kept in memory.
+    """
+
+    def __init__(self, file_path: str, indexed: tuple):
+        """ Initialize a Shard
+        """
+        self.file_path = file_path
+        self.lock_path = file_path + ".lock"
+        self.indexed = indexed
+        self.lock = threading.RLock()
+        self._signature = None
+        self._map = None
+        self.offsets = {}
+        self.indexes = {}
+        self._sorted_ids = None
+
+    def refresh(self):
+        """ Remap the file if it changed since the last access,
+        possibly from another process
+        """
+        try:
+            st = os.stat(self.file_path)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.offsets = {}
+        self.indexes = {attr: {} for attr in self.indexed}
+        self._sorted_ids = None
+        self._signature = signature
+        if signature is None or signature[2] == 0:
+            return
+
+        with open(self.file_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = 0
+        size = len(self._map)
+        while start < size:
+            end = self._map.find(b"\n", start)
+            if end < 0:
+                end = size
+            record = json.loads(self._map[start:end])
+            obj_id = record.get('id')
+            self.offsets[obj_id] = (start, end)
+            for attr in self.indexed:
+                try:
+                    self.indexes[attr].setdefault(
+                        record.get(attr), set()).add(obj_id)
+                except TypeError:
+                    pass
+            start = end + 1
+
+    def read(self, obj_id: str) -> dict:
+        """ Raw JSON dictionary of one record, or None
+        """
+        offset = self.offsets.get(obj_id)
+        if offset is None:
+            return None
+        return json.loads(self._map[offset[0]:offset[1]])
+
+    def ids_after(self, after: str = None, limit: int = None) -> List[str]:
+        """ IDs in order, starting after `after`, at most `limit`
+        """
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.offsets.keys())
+        ids = self._sorted_ids
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        end = len(ids) if limit is None else start + limit
+        return ids[start:end]
+
+    def candidates(self, attributes: dict) -> Iterator[str]:
+        """ IDs possibly matching attributes, narrowed by an index
+        """
+        for attr, value in attributes.items():
+            if attr not in self.indexes:
+                continue
+            try:
+                return list(self.indexes[attr].get(value, ()))
+            except TypeError:
+                continue
+        return list(self.offsets.keys())
+
+    def rewrite(self, obj_id: str, line: bytes = None):
+        """ Rewrite the shard with one record replaced or removed
+
+        Cross-process writers are serialized by a lock file, and the
+        latest version of the shard is reread under that lock.
+        """
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                tmp_path = "{}.tmp.{}".format(self.file_path, os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    for other_id, (start, end) in self.offsets.items():
+                        if other_id != obj_id:
+                            f.write(self._map[start:end] + b"\n")
+                    if line is not None:
+                        f.write(line + b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.file_path)
+                self.refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ShardedStorage():
+    """ Storage engine keeping each model class in hash-sharded files
+    under `.db_<Class>/`, read through mmap
+
+    Worker processes share the OS page cache of the shard files instead
+    of each holding every object, and a write only rewrites the shard of
+    the object. Objects are built from their record on each access.
+    """
+
+    def __init__(self, shards: int = 16):
+        """ Initialize a ShardedStorage
+        """
+        self.default_shards = shards
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def _shards(self, cls: type) -> List[Shard]:
+        """ Shards of a class, the shard count is fixed when the
+        directory is created
+        """
+        s_class = cls.__name__
+        shards = self._classes.get(s_class)
+        if shards is not None:
+            return shards
+        with self._lock:
+            if self._classes.get(s_class) is not None:
+                return self._classes[s_class]
+            dir_path = ".db_{}".format(s_class)
+            count_path = path.join(dir_path, "shards")
+            os.makedirs(dir_path, exist_ok=True)
+            if not path.exists(count_path):
+                with open(count_path, 'w') as f:
+                    f.write(str(self.default_shards))
+            with open(count_path, 'r') as f:
+                count = int(f.read().strip())
+            shards = [Shard(path.join(dir_path, "shard_{:03d}.ndjson"
+                                      .format(i)),
+                            cls._indexed_attributes())
+                      for i in range(count)]
+            self._classes[s_class] = shards
+            return shards
+
+    def _shard(self, cls: type, obj_id: str) -> Shard:
+        """ Shard holding an object ID
+        """
+        shards = self._shards(cls)
+        return shards[zlib.crc32(obj_id.encode()) % len(shards)]
+
+    def load(self, cls: type):
+        """ Map the shards of a class
+        """
+        for shard in self._shards(cls):
+            with shard.lock:
+                shard.refresh()
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object by ID, or None
+        """
+        if type(obj_id) is not str:
+            return None
+        shard = self._shard(cls, obj_id)
+        with shard.lock:
+            shard.refresh()
+            obj_json = shard.read(obj_id)
+        return cls(**obj_json) if obj_json is not None else None
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects with matching attributes
+        """
+        result = []
+        for shard in self._shards(cls):
+            with shard.lock:
+                shard.refresh()
+                objs_json = [shard.read(obj_id)
+                             for obj_id in shard.candidates(attributes)]
+            for obj_json in objs_json:
+                obj = cls(**obj_json)
+                if all(getattr(obj, k) == v for k, v in attributes.items()):
+                    result.append(obj)
+        return result
+
+    def page(self, cls: type, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Objects ordered by ID, starting after `after`, at most `limit`
+        """
+        runs = []
+        for shard in self._shards(cls):
+            with shard.lock:
+                shard.refresh()
+                runs.append(shard.ids_after(after, limit))
+        result = []
+        for obj_id in itertools.islice(heapq.merge(*runs), limit):
+            obj = self.get(cls, obj_id)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of a class
+        """
+        total = 0
+        for shard in self._shards(cls):
+            with shard.lock:
+                shard.refresh()
+                total += len(shard.offsets)
+        return total
+
+    def save(self, obj: TypeVar('Base')):
+        """ Write one object to its shard
+        """
+        line = json.dumps(obj.to_json(True)).encode("utf-8")
+        shard = self._shard(obj.__class__, obj.id)
+        with shard.lock:
+            shard.rewrite(obj.id, line)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove one object from its shard
+        """
+        shard = self._shard(obj.__class__, obj.id)
+        with shard.lock:
+            shard.refresh()
+            if obj.id in shard.offsets:
+                shard.rewrite(obj.id)
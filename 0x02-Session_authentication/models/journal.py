@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from typing import Callable, Iterator, List, Union
+from os import path
+import json
+import os
+import threading
+
+
+def write_atomic(file_path: str, content: Union[str, bytes]):
+    """ Write a file through a temporary file and an atomic rename,
+    so readers and crashes only ever see the old or the new content
+    """
+    tmp_path = "{}.tmp.{}.{}".format(file_path, os.getpid(),
+                                     threading.get_ident())
+    with open(tmp_path, 'wb' if type(content) is bytes else 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+class Journal():
+    """ Append-only write-ahead journal of one model class
+
+    Each save/remove appends one JSON line to `<name>.journal`. Once
+    `compact_every` records have been appended, a background thread folds
+    them into the snapshot file: the journal is first rotated to
+    `<name>.journal.1`, the snapshot is rewritten atomically, then the
+    rotated journal is deleted. Replaying the rotated journal and the live
+    journal over the snapshot is idempotent, so a crash at any step loses
+    nothing.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 snapshot: Callable[[], dict], compact_every: int = 1000,
+                 dumps: Callable[[dict], bytes] = None):
+        """ Initialize a Journal
+
+        `snapshot` returns the objects to write in the snapshot file, as
+        a dict of JSON dictionaries by ID, and `dumps` encodes them.
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.rotated_path = journal_path + ".1"
+        self.snapshot = snapshot
+        self.dumps = dumps if dumps is not None else json.dumps
+        self.compact_every = compact_every
+        self.records = 0
+        self.torn = False
+        self._file = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+
+    def append(self, record: dict):
+        """ Append one record to the journal
+        """
+        self.append_many([record])
+
+    def append_many(self, records: List[dict]):
+        """ Append records to the journal in a single write
+        """
+        if len(records) == 0:
+            return
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a')
+            self._file.write(lines)
+            self._file.flush()
+            self.records += len(records)
+            start = (self.compact_every > 0 and not self._compacting
+                     and self.records >= self.compact_every)
+            if start:
+                self._compacting = True
+        if start:
+            threading.Thread(target=self._compact_in_background,
+                             daemon=True).start()
+
+    def replay(self) -> Iterator[dict]:
+        """ Yield journal records in write order, rotated journal first
+        """
+        count = 0
+        self.torn = False
+        for file_path in (self.rotated_path, self.journal_path):
+            if not path.exists(file_path):
+                continue
+            with open(file_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn write at the end of the journal
+                        self.torn = True
+                        break
+                    count += 1
+                    yield record
+        self.records = count
+
+    def exists(self) -> bool:
+        """ True if there are journal files on disk
+        """
+        return path.exists(self.journal_path) or \
+            path.exists(self.rotated_path)
+
+    def needs_recovery(self) -> bool:
+        """ True if the last replay found an unfinished compaction
+        or a torn record
+        """
+        return self.torn or path.exists(self.rotated_path)
+
+    def compact(self):
+        """ Fold the journal into the snapshot file
+        """
+        with self._compact_lock:
+            with self._lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                if path.exists(self.journal_path):
+                    if path.exists(self.rotated_path):
+                        # fold an older, unfinished compaction in as well
+                        with open(self.journal_path, 'r') as src, \
+                                open(self.rotated_path, 'a') as dst:
+                            dst.write(src.read())
+                        os.remove(self.journal_path)
+                    else:
+                        os.replace(self.journal_path, self.rotated_path)
+                self.records = 0
+                objs_json = self.snapshot()
+            write_atomic(self.snapshot_path, self.dumps(objs_json))
+            if path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+
+    def _compact_in_background(self):
+        """ Compaction thread target
+        """
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+""" Lazy module
+"""
+from typing import Iterator
+import threading
+
+
+class LazyObjects(dict):
+    """ Objects of one class by ID, kept as raw JSON dictionaries
+    until they are first accessed
+
+    An object moves from the raw dictionaries to the built ones under a
+    lock, so that `raw_items` then `dict.items` sees every object even
+    while request threads build them, and lookups missing the built ones
+    look again under the lock.
+    """
+
+    def __init__(self, cls: type, raw: dict = None):
+        """ Initialize a LazyObjects
+        """
+        super().__init__()
+        self._cls = cls
+        self._raw = raw if raw is not None else {}
+        self._lock = threading.RLock()
+
+    def set_raw(self, obj_id: str, obj_json: dict):
+        """ Store (or replace) an object as a raw JSON dictionary
+        """
+        with self._lock:
+            dict.pop(self, obj_id, None)
+            self._raw[obj_id] = obj_json
+
+    def raw_items(self) -> dict:
+        """ Copy of the raw JSON dictionaries of the objects not built yet
+        """
+        with self._lock:
+            return dict(self._raw)
+
+    def _build(self, obj_id: str):
+        """ Build one object from its raw JSON dictionary
+        """
+        with self._lock:
+            obj = self._cls(**self._raw.pop(obj_id))
+            dict.__setitem__(self, obj_id, obj)
+            return obj
+
+    def _build_all(self):
+        """ Build all remaining objects
+        """
+        with self._lock:
+            for obj_id in list(self._raw.keys()):
+                self._build(obj_id)
+
+    def __getitem__(self, obj_id: str):
+        """ Object by ID
+        """
+        obj = dict.get(self, obj_id)
+        if obj is not None:
+            return obj
+        with self._lock:
+            if obj_id in self._raw:
+                return self._build(obj_id)
+            return dict.__getitem__(self, obj_id)
+
+    def get(self, obj_id: str, default=None):
+        """ Object by ID or default
+        """
+        obj = dict.get(self, obj_id)
+        if obj is not None:
+            return obj
+        with self._lock:
+            if obj_id in self._raw:
+                return self._build(obj_id)
+            return dict.get(self, obj_id, default)
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store a built object
+        """
+        with self._lock:
+            self._raw.pop(obj_id, None)
+            dict.__setitem__(self, obj_id, obj)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        with self._lock:
+            if obj_id in self._raw:
+                del self._raw[obj_id]
+            else:
+                dict.__delitem__(self, obj_id)
+
+    def pop(self, obj_id: str, *default):
+        """ Remove an object and return it
+        """
+        with self._lock:
+            if obj_id in self._raw:
+                self._build(obj_id)
+            return dict.pop(self, obj_id, *default)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if the object exists, built or not
+        """
+        if dict.__contains__(self, obj_id):
+            return True
+        with self._lock:
+            return obj_id in self._raw or dict.__contains__(self, obj_id)
+
+    def __len__(self) -> int:
+        """ Number of objects, built or not
+        """
+        with self._lock:
+            return dict.__len__(self) + len(self._raw)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over IDs
+        """
+        self._build_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        """ All IDs
+        """
+        self._build_all()
+        return dict.keys(self)
+
+    def values(self):
+        """ All objects
+        """
+        self._build_all()
+        return dict.values(self)
+
+    def items(self):
+        """ All (ID, object) pairs
+        """
+        self._build_all()
+        return dict.items(self)
@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 """ User module
 """
-import hashlib
 from models.base import Base
+from models.hashers import hash_password, verify_password
 
 
 class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    __indexes__ = ("email",)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -26,22 +29,28 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: hashed by the default hasher
+        (see models/hashers.py)
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hash_password(pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
-        """ Validate a password
+        """ Validate a password, and rehash it with the default hasher
+        when the stored hash is outdated
         """
         if pwd is None or type(pwd) is not str:
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        valid, needs_rehash = verify_password(pwd, self.password)
+        if valid and needs_rehash:
+            self.password = pwd
+            if self.__class__.get(self.id) is not None:
+                self.save()
+        return valid
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
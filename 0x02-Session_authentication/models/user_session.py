@@ -7,6 +7,10 @@ from models.base import Base
 class UserSession(Base):
     """User Session"""
 
+    __slots__ = ("user_id", "session_id")
+    __indexes__ = ("user_id",)
+    __unique__ = ("session_id",)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a User Session instance"""
         super().__init__(*args, **kwargs)
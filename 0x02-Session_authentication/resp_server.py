@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for a Redis server, enough for the session store:
+GET, SET (with EX), EXPIRE, DEL, TTL, SELECT, AUTH, PING, FLUSHDB
+"""
+from os import getenv
+import socketserver
+import threading
+import time
+
+DATA = {}
+LOCK = threading.Lock()
+
+
+def _get(key: bytes):
+    """Value of a live key, or None"""
+    item = DATA.get(key)
+    if item is None:
+        return None
+    if item[1] is not None and item[1] <= time.time():
+        del DATA[key]
+        return None
+    return item
+
+
+def execute(args: list) -> bytes:
+    """Reply to one command"""
+    name = args[0].upper()
+    with LOCK:
+        if name == b"GET":
+            item = _get(args[1])
+            if item is None:
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(item[0]), item[0])
+        if name == b"SET":
+            expires_at = None
+            if len(args) >= 5 and args[3].upper() == b"EX":
+                expires_at = time.time() + int(args[4])
+            DATA[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if name == b"EXPIRE":
+            item = _get(args[1])
+            if item is None:
+                return b":0\r\n"
+            DATA[args[1]] = (item[0], time.time() + int(args[2]))
+            return b":1\r\n"
+        if name == b"DEL":
+            count = sum(1 for key in args[1:]
+                        if _get(key) is not None and DATA.pop(key))
+            return b":%d\r\n" % count
+        if name == b"TTL":
+            item = _get(args[1])
+            if item is None:
+                return b":-2\r\n"
+            if item[1] is None:
+                return b":-1\r\n"
+            return b":%d\r\n" % int(item[1] - time.time())
+        if name == b"FLUSHDB":
+            DATA.clear()
+            return b"+OK\r\n"
+    if name in (b"SELECT", b"AUTH"):
+        return b"+OK\r\n"
+    if name == b"PING":
+        return b"+PONG\r\n"
+    return b"-ERR unknown command '%s'\r\n" % args[0]
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """Handler of one client connection"""
+
+    def handle(self):
+        """Read commands, write replies, until the client disconnects"""
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b"*"):
+                args = line.split()
+            else:
+                args = []
+                for _ in range(int(line[1:-2])):
+                    size = int(self.rfile.readline()[1:-2])
+                    args.append(self.rfile.read(size + 2)[:-2])
+            if args:
+                self.wfile.write(execute(args))
+
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    host = getenv("RESP_HOST", "127.0.0.1")
+    port = int(getenv("RESP_PORT", 6379))
+    with RESPServer((host, port), RESPHandler) as server:
+        server.serve_forever()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+""" Tests of the journal of the models
+"""
+from os import path
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from models.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    """ Replay, torn records, compaction and concurrent appends
+    """
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.snapshot_path = path.join(self.dir_path, "Model.json")
+        self.journal_path = path.join(self.dir_path, "Model.journal")
+        self.objects = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path)
+
+    def journal(self, compact_every: int = 0) -> Journal:
+        """ Journal whose snapshot is `self.objects`
+        """
+        return Journal(self.snapshot_path, self.journal_path,
+                       lambda: dict(self.objects), compact_every)
+
+    def test_replay_in_write_order(self):
+        """ Records come back in the order they were appended
+        """
+        journal = self.journal()
+        journal.append({"op": "save", "id": "1"})
+        journal.append_many([{"op": "save", "id": "2"},
+                             {"op": "remove", "id": "1"}])
+        records = list(self.journal().replay())
+        self.assertEqual([(r["op"], r["id"]) for r in records],
+                         [("save", "1"), ("save", "2"), ("remove", "1")])
+
+    def test_torn_last_record(self):
+        """ A partly written last record is skipped and flagged
+        """
+        journal = self.journal()
+        journal.append_many([{"op": "save", "id": "1"},
+                             {"op": "save", "id": "2"}])
+        with open(self.journal_path, "a") as f:
+            f.write('{"op": "save", "id": "3", "ob')
+
+        replayed = self.journal()
+        records = list(replayed.replay())
+        self.assertEqual([r["id"] for r in records], ["1", "2"])
+        self.assertTrue(replayed.torn)
+        self.assertTrue(replayed.needs_recovery())
+
+        self.objects = {"1": {"id": "1"}, "2": {"id": "2"}}
+        replayed.compact()
+        self.assertFalse(replayed.exists())
+        with open(self.snapshot_path) as f:
+            self.assertEqual(json.load(f), self.objects)
+        recovered = self.journal()
+        self.assertEqual(list(recovered.replay()), [])
+        self.assertFalse(recovered.needs_recovery())
+
+    def test_unfinished_compaction(self):
+        """ A rotated journal left by a crash is replayed first, then
+        folded in by the next compaction
+        """
+        with open(self.journal_path + ".1", "w") as f:
+            f.write(json.dumps({"op": "save", "id": "1"}) + "\n")
+        self.journal().append({"op": "save", "id": "2"})
+
+        replayed = self.journal()
+        self.assertEqual([r["id"] for r in replayed.replay()], ["1", "2"])
+        self.assertTrue(replayed.needs_recovery())
+        replayed.compact()
+        self.assertFalse(path.exists(self.journal_path + ".1"))
+        self.assertFalse(path.exists(self.journal_path))
+
+    def test_concurrent_appends(self):
+        """ Appends of many threads are neither lost nor interleaved
+        """
+        journal = self.journal()
+
+        def append(thread: int):
+            for i in range(200):
+                journal.append({"op": "save", "id": "{}-{}".format(thread,
+                                                                   i)})
+        threads = [threading.Thread(target=append, args=(t,))
+                   for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        replayed = self.journal()
+        ids = [r["id"] for r in replayed.replay()]
+        self.assertFalse(replayed.torn)
+        self.assertEqual(len(ids), 1600)
+        self.assertEqual(len(set(ids)), 1600)
+        for t in range(8):
+            mine = [int(i.split("-")[1]) for i in ids
+                    if i.startswith("{}-".format(t))]
+            self.assertEqual(mine, list(range(200)))
+
+    def test_background_compaction(self):
+        """ Reaching `compact_every` records folds them into the snapshot
+        """
+        journal = self.journal(compact_every=10)
+        for i in range(10):
+            self.objects[str(i)] = {"id": str(i)}
+            journal.append({"op": "save", "id": str(i)})
+        deadline = time.monotonic() + 5
+        while journal._compacting and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(self.snapshot_path) as f:
+            self.assertEqual(len(json.load(f)), 10)
+        self.assertEqual(list(self.journal().replay()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
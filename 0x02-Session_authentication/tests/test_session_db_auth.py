@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Tests of the sessions of SessionDBAuth across restarts"""
+from os import path
+from unittest import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_db_auth import (
+    USER_SESSIONS_IMPORTED, SessionDBAuth)
+from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.user_session import UserSession
+
+
+class Request:
+    """Request carrying a session cookie"""
+
+    def __init__(self, session_id: str):
+        self.cookies = {"_my_session_id": session_id}
+
+
+class TestSessionDBAuth(unittest.TestCase):
+    """Import of the UserSession model, logouts and restarts"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir_path = tempfile.mkdtemp()
+        os.chdir(self.dir_path)
+        patcher = mock.patch.dict(os.environ, {
+            "SESSION_NAME": "_my_session_id",
+            "SESSION_DURATION": "0",
+            "SESSION_STORE": "memory",
+            "SESSION_DB_PATH": path.join(self.dir_path, "sessions.sqlite3"),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir_path)
+
+    def start(self) -> SessionDBAuth:
+        """SessionDBAuth of a freshly started process"""
+        SessionAuth.user_id_by_session_id.clear()
+        return SessionDBAuth()
+
+    def save_user_sessions(self, *sessions):
+        """Write (user_id, session_id) pairs to the UserSession file"""
+        UserSession.load_from_file()
+        for user_id, session_id in sessions:
+            UserSession(user_id=user_id, session_id=session_id).save()
+        UserSession.save_to_file()
+
+    def test_logout_survives_restart(self):
+        """An imported session stays destroyed after a restart"""
+        self.save_user_sessions(("u1", "s1"), ("u2", "s2"))
+        auth = self.start()
+        self.assertEqual(auth.user_id_for_session_id("s1"), "u1")
+        self.assertTrue(auth.destroy_session(Request("s1")))
+        self.assertTrue(auth.destroy_session(Request("s2")))
+        self.assertIsNone(auth.user_id_for_session_id("s1"))
+
+        auth = self.start()
+        self.assertIsNone(auth.user_id_for_session_id("s1"))
+        self.assertIsNone(auth.user_id_for_session_id("s2"))
+
+    def test_new_session_survives_restart(self):
+        """A session created and destroyed stays destroyed"""
+        auth = self.start()
+        session_id = auth.create_session("u1")
+        self.assertEqual(self.start().user_id_for_session_id(session_id),
+                         "u1")
+        self.assertTrue(auth.destroy_session(Request(session_id)))
+        self.assertIsNone(self.start().user_id_for_session_id(session_id))
+
+    def test_store_writes_per_login(self):
+        """A login writes to the session store once at most"""
+        for auth, writes in ((SessionExpAuth(), 1), (self.start(), 0)):
+            with mock.patch.object(auth.store, "set",
+                                   wraps=auth.store.set) as store_set:
+                session_id = auth.create_session("u1")
+            self.assertEqual(store_set.call_count, writes)
+            self.assertEqual(auth.user_id_for_session_id(session_id), "u1")
+
+    def test_import_once(self):
+        """The UserSession file is imported once, then renamed"""
+        self.save_user_sessions(("u1", "s1"))
+        auth = self.start()
+        self.assertIsNotNone(auth.table.get_meta(USER_SESSIONS_IMPORTED))
+        self.assertFalse(path.exists(UserSession._file_path()))
+        self.assertTrue(path.exists(UserSession._file_path() + ".imported"))
+
+        self.save_user_sessions(("u2", "s2"))
+        auth = self.start()
+        self.assertEqual(auth.user_id_for_session_id("s1"), "u1")
+        self.assertIsNone(auth.user_id_for_session_id("s2"))
+
+    def test_table_of_older_version(self):
+        """A table filled without the marker is not imported into again"""
+        auth = self.start()
+        auth.table.import_sessions([("s1", "u1", 0.0, 1.0)])
+        with auth.table._connection() as conn:
+            conn.execute("DELETE FROM session_meta")
+        self.save_user_sessions(("u2", "s2"))
+        auth = self.start()
+        self.assertIsNone(auth.user_id_for_session_id("s2"))
+        self.assertTrue(path.exists(UserSession._file_path()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Tests of the session store backends"""
+from os import path
+from unittest import mock
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+
+from api.v1.auth.session_store import (
+    FileStore, MemoryStore, RedisConnection, RedisStore, SessionStoreError,
+    SQLiteStore)
+import resp_server
+
+
+class Clock:
+    """Clock moved by hand, patched over time.time"""
+
+    def __init__(self):
+        self.now = 1600000000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class GarbageHandler(socketserver.StreamRequestHandler):
+    """Handler replying to every line with a malformed reply"""
+
+    def handle(self):
+        while self.rfile.readline():
+            self.wfile.write(b"?garbage\r\n")
+
+
+class StoreContract:
+    """Behavior shared by every backend, mixed into a TestCase that
+    creates the store in `self.store`"""
+
+    def frozen(self) -> Clock:
+        """Freeze time.time for the rest of the test"""
+        clock = Clock()
+        patcher = mock.patch.object(time, "time", clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return clock
+
+    def test_set_get_delete(self):
+        """A stored session is read back until deleted"""
+        self.assertTrue(self.store.set("s1", {"user_id": "u1"}))
+        self.assertEqual(self.store.get("s1"), {"user_id": "u1"})
+        self.assertTrue(self.store.delete("s1"))
+        self.assertIsNone(self.store.get("s1"))
+
+    def test_missing_session(self):
+        """Unknown sessions are neither read, extended nor deleted"""
+        self.assertIsNone(self.store.get("nope"))
+        self.assertFalse(self.store.expire("nope", 10))
+        self.assertFalse(self.store.delete("nope"))
+
+    def test_ttl(self):
+        """A session expires once its time-to-live has passed"""
+        clock = self.frozen()
+        self.store.set("s1", {"user_id": "u1"}, ttl=10)
+        clock.now += 9
+        self.assertEqual(self.store.get("s1"), {"user_id": "u1"})
+        clock.now += 2
+        self.assertIsNone(self.store.get("s1"))
+        self.assertFalse(self.store.expire("s1", 10))
+
+    def test_expire_slides(self):
+        """expire() restarts the time-to-live from now"""
+        clock = self.frozen()
+        self.store.set("s1", {"user_id": "u1"}, ttl=10)
+        clock.now += 8
+        self.assertTrue(self.store.expire("s1", 10))
+        clock.now += 8
+        self.assertEqual(self.store.get("s1"), {"user_id": "u1"})
+        clock.now += 3
+        self.assertIsNone(self.store.get("s1"))
+
+    def test_set_without_ttl(self):
+        """Setting a session again without ttl makes it permanent"""
+        clock = self.frozen()
+        self.store.set("s1", {"user_id": "u1"}, ttl=10)
+        self.store.set("s1", {"user_id": "u2"})
+        clock.now += 3600
+        self.assertEqual(self.store.get("s1"), {"user_id": "u2"})
+
+    def test_pipeline(self):
+        """Pipelined operations run in order and return their results"""
+        results = self.store.pipeline() \
+            .set("s1", {"user_id": "u1"}, 60) \
+            .get("s1") \
+            .expire("s1", 120) \
+            .delete("s1") \
+            .get("s1") \
+            .execute()
+        self.assertEqual(results,
+                         [True, {"user_id": "u1"}, True, True, None])
+        self.assertEqual(self.store.pipeline().execute(), [])
+
+    def test_concurrent_clients(self):
+        """Sessions of concurrent threads do not leak into each other"""
+        errors = []
+
+        def client(thread: int):
+            try:
+                for i in range(50):
+                    session_id = "{}-{}".format(thread, i)
+                    value = {"user_id": session_id}
+                    self.store.set(session_id, value, ttl=60)
+                    if self.store.get(session_id) != value:
+                        errors.append(session_id)
+                    if i % 2:
+                        self.store.delete(session_id)
+            except Exception as ex:
+                errors.append(ex)
+        threads = [threading.Thread(target=client, args=(t,))
+                   for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for t in range(8):
+            for i in range(50):
+                session_id = "{}-{}".format(t, i)
+                expected = None if i % 2 else {"user_id": session_id}
+                self.assertEqual(self.store.get(session_id), expected)
+
+
+class TestMemoryStore(StoreContract, unittest.TestCase):
+    """MemoryStore"""
+
+    def setUp(self):
+        self.store = MemoryStore()
+
+    def test_expire_in_place(self):
+        """Extending a session keeps a single entry in the timer wheel"""
+        clock = self.frozen()
+        self.store.set("s1", {"user_id": "u1"}, ttl=60)
+        for _ in range(1000):
+            self.store.expire("s1", 60)
+            clock.now += 0.01
+        self.assertEqual(sum(map(len, self.store.wheel._slots.values())), 1)
+        clock.now += 61
+        self.assertEqual(self.store.metrics()["evicted_sessions"], 1)
+        self.assertEqual(self.store.data, {})
+
+    def test_eviction(self):
+        """Expired sessions are dropped from memory as time moves on"""
+        clock = self.frozen()
+        for i in range(100):
+            self.store.set(str(i), i, ttl=1 + i % 10)
+        clock.now += 5
+        self.assertEqual(self.store.metrics()["live_sessions"], 50)
+        clock.now += 6
+        self.assertEqual(self.store.metrics()["live_sessions"], 0)
+        self.assertEqual(self.store.wheel.evicted, 100)
+
+
+class TestFileStore(StoreContract, unittest.TestCase):
+    """FileStore"""
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.store = FileStore(path.join(self.dir_path, "sessions"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path)
+
+
+class TestSQLiteStore(StoreContract, unittest.TestCase):
+    """SQLiteStore"""
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.store = SQLiteStore(path.join(self.dir_path, "sessions.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path)
+
+
+class TestRedisStore(StoreContract, unittest.TestCase):
+    """RedisStore, against the server of resp_server.py"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = resp_server.RESPServer(("127.0.0.1", 0),
+                                            resp_server.RESPHandler)
+        threading.Thread(target=cls.server.serve_forever,
+                         daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        with resp_server.LOCK:
+            resp_server.DATA.clear()
+        self.store = RedisStore("redis://127.0.0.1:{}/0".format(
+            self.server.server_address[1]), pool_size=4)
+
+    def test_pipeline_round_trip(self):
+        """A pipeline uses a single pooled connection"""
+        self.store.pipeline().set("s1", 1).set("s2", 2).execute()
+        self.assertEqual(self.store._pool.qsize(), 1)
+
+    def test_malformed_reply(self):
+        """A connection out of sync is closed, not pooled again"""
+        server = resp_server.RESPServer(("127.0.0.1", 0), GarbageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        store = RedisStore("redis://127.0.0.1:{}/0".format(
+            server.server_address[1]), pool_size=1)
+        close = RedisConnection.close
+        with mock.patch.object(RedisConnection, "close", autospec=True,
+                               side_effect=close) as closed:
+            for _ in range(3):
+                with self.assertRaises(SessionStoreError):
+                    store.get("s1")
+        self.assertEqual(closed.call_count, 3)
+        self.assertEqual(store._pool.qsize(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@
 
 from flask import Flask, abort, jsonify, request, redirect
 from auth import Auth
+from hash_executor import HASHER, Overloaded
 
 # import logging
 
@@ -13,6 +14,20 @@ AUTH = Auth()
 app = Flask(__name__)
 
 
+@app.teardown_request
+def close_db_session(exception: Exception = None) -> None:
+    """Give the database connection back to the pool"""
+    AUTH.close_session()
+
+
+@app.errorhandler(Overloaded)
+def overloaded(error: Exception) -> str:
+    """Password hashing queue full"""
+    response = jsonify({"message": "server overloaded, retry later"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index() -> str:
     """Root endpoint"""
@@ -24,10 +39,12 @@ def users() -> str:
     """Register a new user"""
     email = request.form.get("email")
     password = request.form.get("password")
+    if not email or not password:
+        abort(400)
     try:
         AUTH.register_user(email, password)
         return jsonify({"email": email, "message": "user created"})
-    except Exception as ex:
+    except ValueError:
         return jsonify({"message": "email already registered"}), 400
 
 
@@ -68,6 +85,12 @@ def profile():
     return jsonify({"email": user.email}), 200
 
 
+@app.route("/metrics", methods=["GET"], strict_slashes=False)
+def metrics() -> str:
+    """Metrics of the password hashing pool"""
+    return jsonify({"hash_pool": HASHER.metrics()})
+
+
 @app.route("/reset_password", methods=["POST"], strict_slashes=False)
 def get_reset_password_token():
     """Get reset password token"""
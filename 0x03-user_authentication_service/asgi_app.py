@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Module for the asyncio (ASGI) authentication service
+
+Same endpoints as app.py, served by any ASGI server:
+
+    $ uvicorn asgi_app:app --port 5001
+"""
+
+from http.cookies import SimpleCookie
+from typing import Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs
+import json
+
+from async_auth import AsyncAuth
+from hash_executor import HASHER, Overloaded
+
+AUTH = AsyncAuth()
+
+REASONS = {200: "OK", 302: "Found", 400: "Bad Request",
+           401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+class Request:
+    """HTTP request of the ASGI scope, with its form and cookies"""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope["method"]
+        self.path = scope["path"].rstrip("/") or "/"
+        headers = {}
+        for name, value in scope.get("headers", []):
+            headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        self.headers = headers
+        self.form = {k: v[0] for k, v in
+                     parse_qs(body.decode("utf-8")).items()}
+        self.cookies = {}
+        if "cookie" in headers:
+            cookie = SimpleCookie()
+            cookie.load(headers["cookie"])
+            self.cookies = {k: m.value for k, m in cookie.items()}
+
+
+class Response:
+    """HTTP response"""
+
+    def __init__(self, body: dict = None, status: int = 200,
+                 headers: List[Tuple[str, str]] = None):
+        self.status = status
+        self.headers = headers or []
+        if body is None:
+            body = {"error": REASONS.get(status, "")}
+        self.body = json.dumps(body).encode("utf-8")
+        self.headers.append(("content-type", "application/json"))
+
+    def set_cookie(self, name: str, value: str):
+        """Add a session cookie"""
+        self.headers.append(("set-cookie",
+                             "{}={}; Path=/".format(name, value)))
+
+    async def send(self, send: Callable[[dict], Awaitable[None]]):
+        """Send the response through the ASGI channel"""
+        headers = [(k.encode("latin-1"), v.encode("latin-1"))
+                   for k, v in self.headers]
+        headers.append((b"content-length", str(len(self.body)).encode()))
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": headers})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+async def index(request: Request) -> Response:
+    """Root endpoint"""
+    return Response({"message": "Bienvenue"})
+
+
+async def users(request: Request) -> Response:
+    """Register a new user"""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if not email or not password:
+        return Response(status=400)
+    try:
+        await AUTH.register_user(email, password)
+        return Response({"email": email, "message": "user created"})
+    except ValueError:
+        return Response({"message": "email already registered"}, 400)
+
+
+async def login(request: Request) -> Response:
+    """Login endpoint"""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if not await AUTH.valid_login(email, password):
+        return Response(status=401)
+
+    session_id = await AUTH.create_session(email)
+    response = Response({"email": email, "message": "logged in"})
+    response.set_cookie("session_id", session_id)
+    return response
+
+
+async def logout(request: Request) -> Response:
+    """logout endpoint"""
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return Response(status=403)
+
+    await AUTH.destroy_session(user["id"])
+    return Response({}, 302, [("location", "/")])
+
+
+async def profile(request: Request) -> Response:
+    """Profile endpoint"""
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return Response(status=403)
+
+    return Response({"email": user["email"]})
+
+
+async def metrics(request: Request) -> Response:
+    """Metrics of the password hashing pool"""
+    return Response({"hash_pool": HASHER.metrics()})
+
+
+async def get_reset_password_token(request: Request) -> Response:
+    """Get reset password token"""
+    email = request.form.get("email")
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+    except ValueError:
+        return Response(status=403)
+    return Response({"email": email, "reset_token": reset_token})
+
+
+async def update_password(request: Request) -> Response:
+    """Update password"""
+    email = request.form.get("email")
+    reset_token = request.form.get("reset_token")
+    new_password = request.form.get("new_password")
+    try:
+        await AUTH.update_password(reset_token, new_password)
+    except ValueError:
+        return Response(status=403)
+    return Response({"email": email, "message": "Password updated"})
+
+
+ROUTES: Dict[str, Dict[str, Callable[[Request], Awaitable[Response]]]] = {
+    "/": {"GET": index},
+    "/users": {"POST": users},
+    "/sessions": {"POST": login, "DELETE": logout},
+    "/profile": {"GET": profile},
+    "/metrics": {"GET": metrics},
+    "/reset_password": {"POST": get_reset_password_token,
+                        "PUT": update_password},
+}
+
+
+async def read_body(receive: Callable[[], Awaitable[dict]]) -> bytes:
+    """Body of the request"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def lifespan(receive: Callable, send: Callable) -> None:
+    """Open the database on startup, close it on shutdown"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await AUTH.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await AUTH.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: dict, receive: Callable, send: Callable) -> None:
+    """ASGI application"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    request = Request(scope, await read_body(receive))
+    methods = ROUTES.get(request.path)
+    if methods is None:
+        response = Response(status=404)
+    elif request.method not in methods:
+        response = Response(status=405)
+    else:
+        try:
+            response = await methods[request.method](request)
+        except Overloaded:
+            response = Response({"message":
+                                 "server overloaded, retry later"},
+                                503, [("retry-after", "1")])
+    await response.send(send)
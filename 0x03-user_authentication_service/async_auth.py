@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Module for the asyncio authentication service"""
+
+from typing import Any, Dict, Union
+from sqlalchemy.orm.exc import NoResultFound
+
+from async_db import AsyncDB, sqlite_path
+from db import DB_URL
+from auth import _generate_uuid
+from hash_executor import hash_password_async, verify_password_async
+
+
+class AsyncAuth:
+    """Auth class of the asyncio service, same methods as Auth.
+
+    Users are dictionaries of the columns of the `users` table.
+    """
+
+    def __init__(self, path: str = sqlite_path(DB_URL)):
+        self._db = AsyncDB(path)
+
+    async def start(self) -> None:
+        """Open the database"""
+        await self._db.connect()
+
+    async def stop(self) -> None:
+        """Close the database"""
+        await self._db.close()
+
+    async def register_user(self, email: str,
+                            password: str) -> Dict[str, Any]:
+        """Register a new user"""
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError("User {} already exists".format(email))
+        except NoResultFound:
+            hashed_password = await hash_password_async(password)
+            return await self._db.add_user(email, hashed_password)
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """Validate a login, and rehash the password with the default
+        hasher when the stored hash is outdated"""
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return False
+        valid, needs_rehash = await verify_password_async(
+            password, user["hashed_password"])
+        if valid and needs_rehash:
+            hashed_password = await hash_password_async(password)
+            await self._db.update_user(user["id"],
+                                       hashed_password=hashed_password)
+        return valid
+
+    async def create_session(self, email: str) -> str:
+        """Create session id for a user id, in a single UPDATE"""
+        if email is None:
+            return None
+        session_id = _generate_uuid()
+        if await self._db.update_users_by({"email": email},
+                                          session_id=session_id) == 0:
+            return None
+        return session_id
+
+    async def get_user_from_session_id(
+            self, session_id: str) -> Union[Dict[str, Any], None]:
+        """Get user from a session id"""
+        if session_id is None:
+            return None
+        try:
+            return await self._db.find_user_by(session_id=session_id)
+        except NoResultFound:
+            return None
+
+    async def destroy_session(self, user_id: int) -> None:
+        """Destroy user session"""
+        try:
+            await self._db.update_user(user_id, session_id=None)
+        except NoResultFound:
+            pass
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """Generate a reset password token, in a single UPDATE"""
+        if email is None:
+            raise ValueError()
+        reset_token = _generate_uuid()
+        if await self._db.update_users_by({"email": email},
+                                          reset_token=reset_token) == 0:
+            raise ValueError()
+        return reset_token
+
+    async def update_password(self, reset_token: str,
+                              password: str) -> None:
+        """Update user's password; the token is checked before the slow
+        hash, and consumed by the UPDATE that stores the new hash"""
+        if reset_token is None:
+            raise ValueError()
+        try:
+            await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError()
+        hashed = await hash_password_async(password)
+        if await self._db.update_users_by({"reset_token": reset_token},
+                                          reset_token=None,
+                                          hashed_password=hashed) == 0:
+            raise ValueError()
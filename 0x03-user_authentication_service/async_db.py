@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Async DB module"""
+
+from typing import Any, Dict
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.exc import InvalidRequestError
+import aiosqlite
+import asyncio
+import sqlite3
+
+from db import DB_URL, valid_attr
+
+
+def sqlite_path(url: str) -> str:
+    """Path of the database of a SQLite URL"""
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return ":memory:"
+    return url.split("sqlite:///", 1)[-1]
+
+
+class AsyncDB:
+    """DB class for asyncio, same `users` table and methods as DB.
+
+    aiosqlite runs the SQLite calls in a thread of its own, so queries
+    never block the event loop. All the coroutines share its connection,
+    hence its transaction: each write and its commit or rollback hold
+    `_write_lock`, so that a rollback never discards the write of
+    another coroutine.
+    """
+
+    def __init__(self, path: str = sqlite_path(DB_URL)) -> None:
+        """Initialize a new AsyncDB instance, see `connect`"""
+        self.path = path
+        self._conn = None
+        self._write_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        """Open the database and create the table if needed"""
+        self._conn = await aiosqlite.connect(self.path)
+        self._conn.row_factory = aiosqlite.Row
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")
+        await self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "id INTEGER NOT NULL PRIMARY KEY, "
+            "email VARCHAR(250) NOT NULL, "
+            "hashed_password VARCHAR(250) NOT NULL, "
+            "session_id VARCHAR(250), "
+            "reset_token VARCHAR(250))")
+        for column in ("email", "session_id", "reset_token"):
+            await self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_{0} "
+                "ON users ({0})".format(column))
+        await self._conn.commit()
+
+    async def close(self) -> None:
+        """Close the database"""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def add_user(self, email: str,
+                       hashed_password: bytes) -> Dict[str, Any]:
+        """Add a new user to the database"""
+        async with self._write_lock:
+            try:
+                cursor = await self._conn.execute(
+                    "INSERT INTO users (email, hashed_password) "
+                    "VALUES (?, ?)", (email, hashed_password))
+                await self._conn.commit()
+            except sqlite3.IntegrityError:
+                await self._conn.rollback()
+                raise ValueError("User {} already exists".format(email))
+        return {"id": cursor.lastrowid, "email": email,
+                "hashed_password": hashed_password, "session_id": None,
+                "reset_token": None}
+
+    async def find_user_by(self, **kwargs) -> Dict[str, Any]:
+        """Find user"""
+        if not kwargs or any(x not in valid_attr for x in kwargs):
+            raise InvalidRequestError()
+        where = " AND ".join("{} = ?".format(x) for x in kwargs)
+        async with self._conn.execute(
+                "SELECT * FROM users WHERE {} LIMIT 1".format(where),
+                tuple(kwargs.values())) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            raise NoResultFound()
+        return dict(row)
+
+    async def update_users_by(self, filters: dict, **kwargs) -> int:
+        """Update the users matching `filters` in a single UPDATE
+        statement, return how many"""
+        if not filters or any(x not in valid_attr for x in filters):
+            raise InvalidRequestError()
+        if not kwargs or any(x not in valid_attr for x in kwargs):
+            raise ValueError()
+        assignments = ", ".join("{} = ?".format(x) for x in kwargs)
+        where = " AND ".join("{} = ?".format(x) for x in filters)
+        async with self._write_lock:
+            try:
+                cursor = await self._conn.execute(
+                    "UPDATE users SET {} WHERE {}".format(assignments,
+                                                          where),
+                    tuple(kwargs.values()) + tuple(filters.values()))
+                await self._conn.commit()
+            except sqlite3.IntegrityError:
+                await self._conn.rollback()
+                raise ValueError()
+        return cursor.rowcount
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        """Update user"""
+        if await self.update_users_by({"id": user_id}, **kwargs) == 0:
+            raise NoResultFound()
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """Module for authentication service"""
 
-import bcrypt
 from db import DB
+from hash_executor import hash_password, verify_password
 from user import User
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-import bcrypt
 from uuid import uuid4
 from typing import Union
 
@@ -15,8 +15,8 @@ from typing import Union
 
 
 def _hash_password(password: str) -> bytes:
-    """Hash a password"""
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    """Hash a password, in the hashing pool"""
+    return hash_password(password)
 
 
 def _generate_uuid() -> str:
@@ -30,32 +30,45 @@ class Auth:
     def __init__(self):
         self._db = DB()
 
+    def close_session(self) -> None:
+        """End the database session of the current request"""
+        self._db.remove_session()
+
     def register_user(self, email: str, password: str) -> User:
         """Register a new user"""
         try:
             self._db.find_user_by(email=email)
             raise ValueError("User {} already exists".format(email))
         except NoResultFound:
+            pass
+        try:
             return self._db.add_user(
                 email=email, hashed_password=_hash_password(password)
             )
+        except IntegrityError:
+            raise ValueError("User {} already exists".format(email))
 
     def valid_login(self, email: str, password: str) -> bool:
-        """Validate a login"""
+        """Validate a login, and rehash the password with the default
+        hasher when the stored hash is outdated"""
         try:
             user = self._db.find_user_by(email=email)
         except NoResultFound:
             return False
-        return bcrypt.checkpw(password.encode("utf-8"), user.hashed_password)
+        valid, needs_rehash = verify_password(password, user.hashed_password)
+        if valid and needs_rehash:
+            self._db.update_user(user.id,
+                                 hashed_password=_hash_password(password))
+        return valid
 
     def create_session(self, email: str) -> str:
-        """Create session id for a user id"""
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            return
+        """Create session id for a user id, in a single UPDATE"""
+        if email is None:
+            return None
         session_id = _generate_uuid()
-        self._db.update_user(user.id, session_id=session_id)
+        if self._db.update_users_by({"email": email},
+                                    session_id=session_id) == 0:
+            return None
         return session_id
 
     def get_user_from_session_id(self, session_id: str) -> Union[User, None]:
@@ -63,38 +76,38 @@ class Auth:
         if session_id is None:
             return None
         try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user.email
+            return self._db.find_user_by(session_id=session_id)
         except NoResultFound:
             return None
 
     def destroy_session(self, user_id: int) -> None:
         """Destroy user session"""
         try:
-            user = self._db.find_user_by(id=user_id)
-            self._db.update_user(user.id, session_id=None)
+            self._db.update_user(user_id, session_id=None)
         except NoResultFound:
             pass
 
     def get_reset_password_token(self, email: str) -> str:
-        """Generate a reset password token"""
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            user = None
-        if user is None:
+        """Generate a reset password token, in a single UPDATE"""
+        if email is None:
             raise ValueError()
         reset_token = _generate_uuid()
-        self._db.update_user(user.id, reset_token=reset_token)
+        if self._db.update_users_by({"email": email},
+                                    reset_token=reset_token) == 0:
+            raise ValueError()
         return reset_token
 
     def update_password(self, reset_token: str, password: str) -> None:
-        """Update user's password"""
+        """Update user's password; the token is checked before the slow
+        hash, and consumed by the UPDATE that stores the new hash"""
+        if reset_token is None:
+            raise ValueError()
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
-            hashed = _hash_password(password)
-            self._db.update_user(
-                user.id, reset_token=None, hashed_password=hashed
-            )
+            self._db.find_user_by(reset_token=reset_token)
         except NoResultFound:
             raise ValueError()
+        hashed = _hash_password(password)
+        if self._db.update_users_by({"reset_token": reset_token},
+                                    reset_token=None,
+                                    hashed_password=hashed) == 0:
+            raise ValueError()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Module for the benchmark of user lookups and logins
+
+Fills a database with `users` users sharing one password hash, then
+measures the latency of `find_user_by` (by email and by session ID)
+and of a login (`valid_login` + `create_session`):
+
+    $ python3 benchmark_users.py [--users 1000000] [--no-index]
+
+`--no-index` drops the indexes of the users table, to compare with full
+table scans. The database is kept, and reused by the next runs with the
+same number of users.
+"""
+
+from typing import Callable, List
+import argparse
+import os
+import random
+import time
+
+
+def percentiles(latencies: List[float]) -> str:
+    """Average, p50 and p99 in milliseconds"""
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return "avg {:.3f} ms, p50 {:.3f} ms, p99 {:.3f} ms".format(
+        1000 * sum(latencies) / n, 1000 * latencies[n // 2],
+        1000 * latencies[min(n - 1, int(n * 0.99))])
+
+
+def measure(fn: Callable[[int], None], samples: List[int]) -> List[float]:
+    """Latency of fn(sample) for each sample"""
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        fn(sample)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    """Fill the database and run the measures"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--db", default="benchmark_users.db")
+    parser.add_argument("--no-index", action="store_true")
+    args = parser.parse_args()
+    os.environ["DB_URL"] = "sqlite:///" + args.db
+
+    from sqlalchemy import text
+    from sqlalchemy.orm.exc import NoResultFound
+    from auth import Auth
+    from hash_executor import hash_password
+    from user import User
+
+    auth = Auth()
+    db = auth._db
+    engine = db._engine
+    with engine.begin() as connection:
+        count = connection.execute(
+            text("SELECT COUNT(*) FROM users")).scalar()
+    if count != args.users:
+        start = time.perf_counter()
+        hashed = hash_password("password")
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM users"))
+            batch = 10000
+            for first in range(0, args.users, batch):
+                connection.execute(
+                    User.__table__.insert(),
+                    [{"email": "user{}@bench.io".format(i),
+                      "hashed_password": hashed,
+                      "session_id": "session-{}".format(i)}
+                     for i in range(first, min(first + batch, args.users))])
+        print("inserted {} users in {:.1f} s".format(
+            args.users, time.perf_counter() - start))
+
+    with engine.begin() as connection:
+        for index in User.__table__.indexes:
+            if args.no_index:
+                index.drop(bind=connection, checkfirst=True)
+            else:
+                index.create(bind=connection, checkfirst=True)
+    print("{} users, {}".format(
+        args.users, "no index" if args.no_index else "indexed"))
+
+    rand = random.Random(0)
+    samples = [rand.randrange(args.users) for _ in range(args.lookups)]
+
+    def find_by_email(i: int):
+        db.find_user_by(email="user{}@bench.io".format(i))
+        db.remove_session()
+
+    def find_by_session(i: int):
+        try:
+            db.find_user_by(session_id="session-{}".format(i))
+        except NoResultFound:
+            # logged in by a previous run
+            pass
+        db.remove_session()
+
+    def log_in(i: int):
+        email = "user{}@bench.io".format(i)
+        assert auth.valid_login(email, "password")
+        auth.create_session(email)
+        db.remove_session()
+
+    print("find_user_by(email):      " +
+          percentiles(measure(find_by_email, samples)))
+    print("find_user_by(session_id): " +
+          percentiles(measure(find_by_session, samples)))
+    print("login:                    " +
+          percentiles(measure(log_in, samples[:args.logins])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Module for the bulk import and export of users
+
+    $ python3 bulk.py import users.csv [--format csv] [--workers 8]
+    $ python3 bulk.py export users.ndjson [--format ndjson]
+
+Imported rows have an `email` and either a `password`, hashed in
+parallel, or a `hashed_password` kept as is (e.g. from an export).
+Exports hold `id`, `email` and `hashed_password`. `-` reads stdin or
+writes stdout; the format defaults to the file extension.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import IO, Iterable, Iterator, List
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+import hashers
+from db import DB
+
+EXPORT_FIELDS = ["id", "email", "hashed_password"]
+
+
+class ImportReport:
+    """Counters of an import"""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = []
+        self.invalid = []
+        self.started_at = time.perf_counter()
+
+    @property
+    def rows_per_sec(self) -> float:
+        """Rows read per second"""
+        elapsed = time.perf_counter() - self.started_at
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def to_json(self) -> dict:
+        """Summary of the report"""
+        return {"read": self.read, "inserted": self.inserted,
+                "duplicates": len(self.duplicates),
+                "invalid": len(self.invalid),
+                "rows_per_sec": round(self.rows_per_sec, 1)}
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """Rows of a CSV file with a header line, or of an NDJSON file"""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """Lists of at most `size` rows"""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_users(db: DB, rows: Iterable[dict], batch_size: int = 1000,
+                 workers: int = None, processes: bool = False,
+                 report: ImportReport = None) -> ImportReport:
+    """Register users batch by batch: duplicated emails (in the file or
+    in the database) are reported and skipped before hashing, passwords
+    are hashed by `workers` threads (bcrypt releases the GIL) or
+    processes, and each batch is inserted with one executemany"""
+    if report is None:
+        report = ImportReport()
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    seen = set()
+    with pool_class(workers or os.cpu_count() or 1) as pool:
+        for batch in _batches(rows, batch_size):
+            report.read += len(batch)
+            valid = []
+            for row in batch:
+                email = row.get("email")
+                if not email or not (row.get("password") or
+                                     row.get("hashed_password")):
+                    report.invalid.append(row.get("email"))
+                elif email in seen:
+                    report.duplicates.append(email)
+                else:
+                    seen.add(email)
+                    valid.append(row)
+            existing = db.existing_emails(row["email"] for row in valid)
+            report.duplicates.extend(row["email"] for row in valid
+                                     if row["email"] in existing)
+            valid = [row for row in valid if row["email"] not in existing]
+
+            to_hash = [row["password"] for row in valid
+                       if not row.get("hashed_password")]
+            hashed = iter(pool.map(hashers.hash_password, to_hash,
+                                   chunksize=max(1, len(to_hash) // 64)))
+            users = []
+            for row in valid:
+                hashed_password = row.get("hashed_password") or next(hashed)
+                users.append({"email": row["email"],
+                              "hashed_password":
+                              hashed_password.encode("utf-8")})
+            try:
+                report.inserted += db.add_users(users)
+            except IntegrityError:
+                # registered since existing_emails: insert one by one
+                for user in users:
+                    try:
+                        report.inserted += db.add_users([user])
+                    except IntegrityError:
+                        report.duplicates.append(user["email"])
+    return report
+
+
+def export_users(db: DB, stream: IO[str], fmt: str,
+                 batch_size: int = 1000) -> int:
+    """Write all users as CSV or NDJSON, return how many"""
+    count = 0
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, EXPORT_FIELDS)
+        writer.writeheader()
+    for user in db.iter_users(batch_size):
+        hashed_password = user["hashed_password"]
+        if isinstance(hashed_password, bytes):
+            hashed_password = hashed_password.decode("utf-8")
+        row = {"id": user["id"], "email": user["email"],
+               "hashed_password": hashed_password}
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(row) + "\n")
+        count += 1
+    return count
+
+
+def _format(path: str, fmt: str) -> str:
+    """Format of a file, from its extension by default"""
+    if fmt:
+        return fmt
+    return "csv" if path.endswith(".csv") else "ndjson"
+
+
+def main():
+    """Command line interface"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true",
+                        help="hash in processes instead of threads")
+    args = parser.parse_args()
+    fmt = _format(args.path, args.format)
+    db = DB()
+
+    start = time.perf_counter()
+    if args.command == "import":
+        stream = sys.stdin if args.path == "-" else \
+            open(args.path, "r", newline="")
+        with stream:
+            report = import_users(db, read_rows(stream, fmt),
+                                  args.batch_size, args.workers,
+                                  args.processes)
+        for email in report.duplicates:
+            print("duplicate: {}".format(email), file=sys.stderr)
+        for email in report.invalid:
+            print("invalid: {}".format(email), file=sys.stderr)
+        print(json.dumps(report.to_json()), file=sys.stderr)
+    else:
+        stream = sys.stdout if args.path == "-" else \
+            open(args.path, "w", newline="")
+        with stream:
+            count = export_users(db, stream, fmt, args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(json.dumps({"exported": count, "rows_per_sec": round(
+            count / elapsed if elapsed > 0 else 0.0, 1)}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
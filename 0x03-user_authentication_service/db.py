@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """DB module"""
 
-from sqlalchemy import create_engine
+from os import getenv
+from typing import Iterable, Iterator, List, Set
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import StaticPool
 from user import Base, User
 # import logging
 
@@ -14,24 +18,105 @@ from user import Base, User
 
 valid_attr = ["id", "email", "hashed_password", "session_id", "reset_token"]
 
+DB_URL = getenv("DB_URL", "sqlite:///a.db")
+DB_ECHO = getenv("DB_ECHO", "").lower() in ("1", "true", "yes")
+try:
+    DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", 5))
+except ValueError:
+    DB_POOL_SIZE = 5
+try:
+    DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", 10))
+except ValueError:
+    DB_MAX_OVERFLOW = 10
+try:
+    DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", 30))
+except ValueError:
+    DB_POOL_TIMEOUT = 30.0
+try:
+    DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", 3600))
+except ValueError:
+    DB_POOL_RECYCLE = 3600
+
+
+def _is_memory(url: str) -> bool:
+    """Whether a SQLite URL is an in-memory database"""
+    return url in ("sqlite://", "sqlite:///:memory:") or \
+        "mode=memory" in url
+
+
+def _sqlite_pragmas(memory: bool):
+    """Connect listener tuning each new SQLite connection"""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA cache_size=-16000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+    return on_connect
+
+
+def make_engine(url: str = DB_URL, echo: bool = DB_ECHO) -> Engine:
+    """Engine with a connection pool sized by DB_POOL_SIZE and
+    DB_MAX_OVERFLOW; an in-memory SQLite database is one connection
+    shared by all threads"""
+    if not url.startswith("sqlite"):
+        return create_engine(url, echo=echo, pool_size=DB_POOL_SIZE,
+                             max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT,
+                             pool_recycle=DB_POOL_RECYCLE,
+                             pool_pre_ping=True)
+    memory = _is_memory(url)
+    if memory:
+        engine = create_engine(url, echo=echo, poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url, echo=echo, pool_size=DB_POOL_SIZE,
+                               max_overflow=DB_MAX_OVERFLOW,
+                               pool_timeout=DB_POOL_TIMEOUT,
+                               connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _sqlite_pragmas(memory))
+    return engine
+
+
+def migrate(engine: Engine) -> None:
+    """Add the indexes of the users table missing from an existing
+    database; a unique index fails on duplicated values"""
+    with engine.begin() as connection:
+        for index in User.__table__.indexes:
+            try:
+                index.create(bind=connection, checkfirst=True)
+            except IntegrityError as ex:
+                raise ValueError("cannot create {}: duplicated {}".format(
+                    index.name, ", ".join(c.name for c in index.columns))
+                ) from ex
+
 
 class DB:
     """DB class"""
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance"""
-        self._engine = create_engine("sqlite:///a.db", echo=True)
-        Base.metadata.drop_all(self._engine)
+    def __init__(self, url: str = DB_URL, reset: bool = False) -> None:
+        """Initialize a new DB instance, `reset` drops all tables"""
+        self._engine = make_engine(url)
+        if reset:
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        migrate(self._engine)
+        self.__session = scoped_session(
+            sessionmaker(bind=self._engine, expire_on_commit=False))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object"""
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        """Session of the current thread"""
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """Close the session of the current thread, e.g. at the end of
+        a request"""
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Add a new user to the database"""
@@ -44,9 +129,44 @@ class DB:
             raise
         return new_user
 
+    def add_users(self, users: List[dict]) -> int:
+        """Insert many users (dictionaries of columns) in one transaction
+        with a single executemany, return how many"""
+        if not users:
+            return 0
+        with self._engine.begin() as connection:
+            connection.execute(User.__table__.insert(), users)
+        return len(users)
+
+    def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """Emails among `emails` already registered, in one query"""
+        emails = list(emails)
+        if not emails:
+            return set()
+        column = User.__table__.c.email
+        with self._engine.connect() as connection:
+            return set(connection.execute(
+                select(column).where(column.in_(emails))).scalars())
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[dict]:
+        """All users ordered by id, read batch by batch by id ranges
+        rather than loaded at once"""
+        table = User.__table__
+        last_id = 0
+        while True:
+            with self._engine.connect() as connection:
+                rows = connection.execute(
+                    select(table).where(table.c.id > last_id)
+                    .order_by(table.c.id).limit(batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row._mapping)
+            last_id = rows[-1].id
+
     def find_user_by(self, **kwargs) -> User:
         """Find user"""
-        session = self.__session
+        session = self._session
         if not kwargs or any(x not in valid_attr for x in kwargs):
             raise InvalidRequestError()
 
@@ -55,19 +175,24 @@ class DB:
         except Exception as ex:
             raise NoResultFound()
 
-    def update_user(self, user_id: int, **kwargs) -> None:
-        """Update user"""
-        try:
-            user = self.find_user_by(id=user_id)
-        except NoResultFound:
-            raise NoResultFound()
-
-        for key, value in kwargs.items():
-            if not hasattr(user, key):
-                raise ValueError()
+    def update_users_by(self, filters: dict, **kwargs) -> int:
+        """Update the users matching `filters` in a single UPDATE
+        statement, return how many"""
+        if not filters or any(x not in valid_attr for x in filters):
+            raise InvalidRequestError()
+        if not kwargs or any(x not in valid_attr for x in kwargs):
+            raise ValueError()
 
-            setattr(user, key, value)
+        session = self._session
         try:
-            self.__session.commit()
-        except InvalidRequestError:
+            count = session.query(User).filter_by(**filters).update(kwargs)
+            session.commit()
+        except (IntegrityError, InvalidRequestError):
+            session.rollback()
             raise ValueError()
+        return count
+
+    def update_user(self, user_id: int, **kwargs) -> None:
+        """Update user"""
+        if self.update_users_by({"id": user_id}, **kwargs) == 0:
+            raise NoResultFound()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Module for the password hashing executor"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import getenv
+from typing import Any, Callable, Tuple, Union
+import asyncio
+import os
+import threading
+import time
+
+import hashers
+
+try:
+    HASH_WORKERS = int(getenv("HASH_WORKERS", os.cpu_count() or 1))
+except ValueError:
+    HASH_WORKERS = os.cpu_count() or 1
+try:
+    HASH_QUEUE_SIZE = int(getenv("HASH_QUEUE_SIZE", 4 * HASH_WORKERS))
+except ValueError:
+    HASH_QUEUE_SIZE = 4 * HASH_WORKERS
+
+
+class Overloaded(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class HashExecutor:
+    """Thread pool running password hashes off the request thread.
+
+    bcrypt releases the GIL while hashing, so `workers` hashes run in
+    parallel. At most `max_queue` more calls wait for a worker: beyond
+    that, `run` raises Overloaded at once instead of queueing.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS,
+                 max_queue: int = HASH_QUEUE_SIZE):
+        """Initialize a HashExecutor"""
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(self.workers,
+                                        thread_name_prefix="hash")
+        self._slots = threading.BoundedSemaphore(self.workers +
+                                                 self.max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.hash_time = 0.0
+
+    def _call(self, queued_at: float, fn: Callable, args: tuple) -> Any:
+        """Run one call in a worker"""
+        started_at = time.monotonic()
+        with self._lock:
+            self.running += 1
+            self.wait_time += started_at - queued_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.hash_time += time.monotonic() - started_at
+            self._slots.release()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue fn(*args) in the pool, raise Overloaded if it is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded("password hashing queue is full")
+        with self._lock:
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            return self._pool.submit(self._call, time.monotonic(), fn, args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the pool and wait for its result"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def metrics(self) -> dict:
+        """Queue depth and counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": (1000 * self.wait_time / self.completed
+                                if self.completed else 0.0),
+                "avg_hash_ms": (1000 * self.hash_time / self.completed
+                                if self.completed else 0.0),
+                "hasher": hashers.default_hasher().name,
+            }
+
+
+HASHER = HashExecutor()
+
+
+def hash_password(password: str) -> bytes:
+    """Hash a password in the pool, with the default hasher"""
+    return HASHER.run(hashers.hash_password, password).encode("utf-8")
+
+
+def verify_password(password: str,
+                    hashed_password: Union[str, bytes]) -> Tuple[bool, bool]:
+    """Check a password against its hash in the pool, return
+    (valid, needs_rehash)"""
+    return HASHER.run(hashers.verify_password, password, hashed_password)
+
+
+async def hash_password_async(password: str) -> bytes:
+    """Hash a password in the pool from a coroutine"""
+    hashed = await HASHER.run_async(hashers.hash_password, password)
+    return hashed.encode("utf-8")
+
+
+async def verify_password_async(
+        password: str,
+        hashed_password: Union[str, bytes]) -> Tuple[bool, bool]:
+    """Check a password against its hash in the pool from a coroutine,
+    return (valid, needs_rehash)"""
+    return await HASHER.run_async(hashers.verify_password, password,
+                                  hashed_password)
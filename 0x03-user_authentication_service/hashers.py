@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+""" Password hashers module
+
+Hashes are self-describing strings, so that several algorithms and
+cost parameters can live in the same table:
+
+- `sha256-legacy`: 64 hexadecimal digits, unsalted (verify only)
+- `bcrypt`: `$2b$<rounds>$...` (needs the `bcrypt` package)
+- `scrypt`: `$scrypt$n=<n>,r=<r>,p=<p>$<salt>$<hash>` (standard library)
+- `argon2`: `$argon2id$v=19$m=...` (needs the `argon2-cffi` package)
+
+New hashes use PASSWORD_HASHER (default: `bcrypt` when installed, else
+`scrypt`). A hash made by another algorithm or with other parameters
+verifies, and `verify_password()` reports it as needing a rehash.
+
+Pick cost parameters for a target verification time on this machine:
+
+    $ python3 hashers.py [target_ms]
+"""
+from os import getenv
+from typing import Dict, Tuple, Union
+import base64
+import hashlib
+import hmac
+import os
+import re
+import sys
+import time
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+
+def _int_env(name: str, default: int) -> int:
+    """ Integer from the environment
+    """
+    try:
+        return int(getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _b64(data: bytes) -> str:
+    """ Unpadded base64
+    """
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(data: str) -> bytes:
+    """ Decode unpadded base64
+    """
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+class Hasher():
+    """ Password hashing algorithm
+    """
+
+    name = None
+
+    def available(self) -> bool:
+        """ Whether the algorithm can be used here
+        """
+        return True
+
+    def identify(self, encoded: str) -> bool:
+        """ Whether a hash was made by this algorithm
+        """
+        raise NotImplementedError
+
+    def encode(self, password: str) -> str:
+        """ Hash a password
+        """
+        raise NotImplementedError
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """ Check a password against a hash of this algorithm
+        """
+        raise NotImplementedError
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Whether a hash was made with other parameters
+        """
+        return False
+
+    def with_cost(self, level: int) -> 'Hasher':
+        """ Same algorithm at cost `level` (2 ** level work factor),
+        None if it has no cost parameter
+        """
+        return None
+
+    def cost_env(self) -> Dict[str, int]:
+        """ Environment variables of the cost parameters
+        """
+        return {}
+
+
+class SHA256LegacyHasher(Hasher):
+    """ Unsalted SHA-256, the former format of User passwords
+    """
+
+    name = 'sha256-legacy'
+    pattern = re.compile(r'[0-9a-f]{64}')
+
+    def identify(self, encoded: str) -> bool:
+        """ Whether a hash is a SHA-256 hexadecimal digest
+        """
+        return self.pattern.fullmatch(encoded) is not None
+
+    def encode(self, password: str) -> str:
+        """ Hash a password
+        """
+        return hashlib.sha256(password.encode()).hexdigest().lower()
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """ Check a password
+        """
+        return hmac.compare_digest(self.encode(password), encoded)
+
+
+class BcryptHasher(Hasher):
+    """ bcrypt with `rounds` (log2 of the iterations)
+    """
+
+    name = 'bcrypt'
+
+    def __init__(self, rounds: int = None):
+        """ Initialize a BcryptHasher
+        """
+        self.rounds = rounds or _int_env('BCRYPT_ROUNDS', 12)
+
+    def available(self) -> bool:
+        """ Whether the bcrypt package is installed
+        """
+        return bcrypt is not None
+
+    def identify(self, encoded: str) -> bool:
+        """ Whether a hash is a bcrypt hash
+        """
+        return encoded[:4] in ('$2a$', '$2b$', '$2y$')
+
+    def encode(self, password: str) -> str:
+        """ Hash a password
+        """
+        return bcrypt.hashpw(password.encode('utf-8'),
+                             bcrypt.gensalt(self.rounds)).decode('ascii')
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """ Check a password
+        """
+        return bcrypt.checkpw(password.encode('utf-8'),
+                              encoded.encode('ascii'))
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Whether a hash was made with other rounds
+        """
+        return encoded[4:6] != '{:02d}'.format(self.rounds)
+
+    def with_cost(self, level: int) -> Hasher:
+        """ bcrypt with 2 ** level iterations
+        """
+        return BcryptHasher(max(4, min(level, 31)))
+
+    def cost_env(self) -> Dict[str, int]:
+        """ BCRYPT_ROUNDS
+        """
+        return {'BCRYPT_ROUNDS': self.rounds}
+
+
+class ScryptHasher(Hasher):
+    """ scrypt of the standard library with cost `n`, block size `r`
+    and parallelization `p`
+    """
+
+    name = 'scrypt'
+    pattern = re.compile(r'\$scrypt\$n=(\d+),r=(\d+),p=(\d+)'
+                         r'\$([A-Za-z0-9+/]+)\$([A-Za-z0-9+/]+)')
+
+    def __init__(self, n: int = None, r: int = None, p: int = None):
+        """ Initialize a ScryptHasher
+        """
+        self.n = n or _int_env('SCRYPT_N', 2 ** 15)
+        self.r = r or _int_env('SCRYPT_R', 8)
+        self.p = p or _int_env('SCRYPT_P', 1)
+
+    def available(self) -> bool:
+        """ Whether hashlib was built with scrypt
+        """
+        return hasattr(hashlib, 'scrypt')
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int,
+                p: int) -> bytes:
+        """ Derive a 32 bytes key
+        """
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n,
+                              r=r, p=p, maxmem=2 * 128 * n * r * p,
+                              dklen=32)
+
+    def identify(self, encoded: str) -> bool:
+        """ Whether a hash is a scrypt hash
+        """
+        return encoded.startswith('$scrypt$')
+
+    def encode(self, password: str) -> str:
+        """ Hash a password
+        """
+        salt = os.urandom(16)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return '$scrypt$n={},r={},p={}${}${}'.format(
+            self.n, self.r, self.p, _b64(salt), _b64(key))
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """ Check a password
+        """
+        match = self.pattern.fullmatch(encoded)
+        if match is None:
+            return False
+        n, r, p = (int(v) for v in match.group(1, 2, 3))
+        key = self._derive(password, _unb64(match.group(4)), n, r, p)
+        return hmac.compare_digest(key, _unb64(match.group(5)))
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Whether a hash was made with other parameters
+        """
+        match = self.pattern.fullmatch(encoded)
+        return match is None or \
+            tuple(int(v) for v in match.group(1, 2, 3)) != \
+            (self.n, self.r, self.p)
+
+    def with_cost(self, level: int) -> Hasher:
+        """ scrypt with n = 2 ** level
+        """
+        return ScryptHasher(2 ** max(10, min(level, 24)), self.r, self.p)
+
+    def cost_env(self) -> Dict[str, int]:
+        """ SCRYPT_N, SCRYPT_R and SCRYPT_P
+        """
+        return {'SCRYPT_N': self.n, 'SCRYPT_R': self.r, 'SCRYPT_P': self.p}
+
+
+class Argon2Hasher(Hasher):
+    """ Argon2id with `time_cost` passes over `memory_cost` KiB
+    """
+
+    name = 'argon2'
+
+    def __init__(self, time_cost: int = None, memory_cost: int = None):
+        """ Initialize an Argon2Hasher
+        """
+        self.time_cost = time_cost or _int_env('ARGON2_TIME_COST', 3)
+        self.memory_cost = memory_cost or _int_env('ARGON2_MEMORY_COST',
+                                                   65536)
+        self._hasher = None
+        if argon2 is not None:
+            self._hasher = argon2.PasswordHasher(
+                time_cost=self.time_cost, memory_cost=self.memory_cost)
+
+    def available(self) -> bool:
+        """ Whether the argon2-cffi package is installed
+        """
+        return argon2 is not None
+
+    def identify(self, encoded: str) -> bool:
+        """ Whether a hash is an Argon2 hash
+        """
+        return encoded.startswith('$argon2')
+
+    def encode(self, password: str) -> str:
+        """ Hash a password
+        """
+        return self._hasher.hash(password)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """ Check a password
+        """
+        try:
+            return self._hasher.verify(encoded, password)
+        except argon2.exceptions.VerificationError:
+            return False
+        except argon2.exceptions.InvalidHash:
+            return False
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Whether a hash was made with other parameters
+        """
+        return self._hasher.check_needs_rehash(encoded)
+
+    def with_cost(self, level: int) -> Hasher:
+        """ Argon2id over 2 ** level KiB
+        """
+        return Argon2Hasher(self.time_cost, 2 ** max(10, min(level, 22)))
+
+    def cost_env(self) -> Dict[str, int]:
+        """ ARGON2_TIME_COST and ARGON2_MEMORY_COST
+        """
+        return {'ARGON2_TIME_COST': self.time_cost,
+                'ARGON2_MEMORY_COST': self.memory_cost}
+
+
+HASHERS = {}
+
+
+def register_hasher(hasher: Hasher):
+    """ Add or replace a hasher of the registry
+    """
+    HASHERS[hasher.name] = hasher
+
+
+for _hasher in (SHA256LegacyHasher(), BcryptHasher(), ScryptHasher(),
+                Argon2Hasher()):
+    register_hasher(_hasher)
+
+
+def default_hasher() -> Hasher:
+    """ Hasher of new hashes, see PASSWORD_HASHER
+    """
+    name = getenv('PASSWORD_HASHER')
+    if name is None:
+        name = 'bcrypt' if HASHERS['bcrypt'].available() else 'scrypt'
+    hasher = HASHERS.get(name)
+    if hasher is None or not hasher.available():
+        return HASHERS['scrypt']
+    return hasher
+
+
+def identify_hasher(encoded: str) -> Hasher:
+    """ Hasher of a hash, or None
+    """
+    for hasher in HASHERS.values():
+        if hasher.available() and hasher.identify(encoded):
+            return hasher
+    return None
+
+
+def hash_password(password: str) -> str:
+    """ Hash a password with the default hasher
+    """
+    return default_hasher().encode(password)
+
+
+def verify_password(password: str,
+                    encoded: Union[str, bytes]) -> Tuple[bool, bool]:
+    """ Check a password against a hash of any registered algorithm,
+    return (valid, needs_rehash)
+    """
+    if isinstance(encoded, bytes):
+        encoded = encoded.decode('ascii', 'replace')
+    if not isinstance(password, str) or not isinstance(encoded, str):
+        return False, False
+    hasher = identify_hasher(encoded)
+    if hasher is None or not hasher.verify(password, encoded):
+        return False, False
+    default = default_hasher()
+    return True, hasher is not default or default.needs_update(encoded)
+
+
+def calibrate(hasher: Hasher, target: float) -> Hasher:
+    """ Same algorithm with the highest cost verifying in at most
+    `target` seconds, or the lowest cost
+    """
+    best = None
+    for level in range(4, 25):
+        candidate = hasher.with_cost(level)
+        if candidate is None:
+            return hasher
+        encoded = candidate.encode('calibration')
+        start = time.perf_counter()
+        candidate.verify('calibration', encoded)
+        elapsed = time.perf_counter() - start
+        if elapsed > target and best is not None:
+            break
+        best = candidate
+        if elapsed > target:
+            break
+    return best
+
+
+if __name__ == '__main__':
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    print("# cost parameters for {:.0f} ms per verification"
+          .format(target_ms))
+    for hasher in HASHERS.values():
+        if not hasher.available() or hasher.with_cost(10) is None:
+            continue
+        tuned = calibrate(hasher, target_ms / 1000)
+        for name, value in tuned.cost_env().items():
+            print("{}={}".format(name, value))
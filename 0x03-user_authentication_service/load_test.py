@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Module for the load test of the authentication services
+
+Runs the same scenario against each server at increasing concurrency,
+and prints requests/sec and latency percentiles:
+
+    $ python3 app.py &
+    $ uvicorn asgi_app:app --port 5001 &
+    $ python3 load_test.py flask=http://localhost:5000 \\
+          asgi=http://localhost:5001 --concurrency 1,8,32,128
+
+Each client has its own user, registered if needed (`POST /users`). It
+logs in once (`POST /sessions`, a password check), then
+requests `GET /profile` with its session cookie; `--login-ratio` sets
+the share of the requests that log in again. Failed requests are counted
+by status (e.g. 503 when the hashing queue is full) or `conn`.
+"""
+
+from collections import Counter
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode, urlparse
+import argparse
+import asyncio
+import random
+import time
+
+
+class StatusError(Exception):
+    """Unexpected HTTP status"""
+
+
+class Client:
+    """HTTP/1.1 client keeping one connection alive"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, form: dict = None,
+                      cookie: str = None) -> Tuple[int, Dict[str, str]]:
+        """Send a request, return (status, headers)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port)
+        body = urlencode(form).encode() if form else b""
+        lines = ["{} {} HTTP/1.1".format(method, path),
+                 "Host: {}:{}".format(self.host, self.port),
+                 "Content-Length: {}".format(len(body))]
+        if form:
+            lines.append("Content-Type: application/x-www-form-urlencoded")
+        if cookie:
+            lines.append("Cookie: {}".format(cookie))
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        try:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("connection closed")
+            headers = {}
+            while True:
+                line = (await self.reader.readline()).decode("latin-1")
+                if line in ("\r\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            await self.reader.readexactly(length)
+        except Exception:
+            await self.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status_line.split()[1]), headers
+
+    async def close(self):
+        """Close the connection"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def login(client: Client, email: str, password: str) -> str:
+    """Log in, return the session cookie"""
+    status, headers = await client.request(
+        "POST", "/sessions", {"email": email, "password": password})
+    if status != 200:
+        raise StatusError(status)
+    return headers["set-cookie"].split(";")[0]
+
+
+async def worker(url: str, email: str, password: str, deadline: float,
+                 login_ratio: float, latencies: List[float],
+                 errors: Counter):
+    """Run the scenario until the deadline"""
+    client = Client(url)
+    rand = random.Random()
+    cookie = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if cookie is None or rand.random() < login_ratio:
+                cookie = await login(client, email, password)
+            else:
+                status, _ = await client.request("GET", "/profile",
+                                                 cookie=cookie)
+                if status != 200:
+                    raise StatusError(status)
+        except StatusError as ex:
+            errors[str(ex)] += 1
+            cookie = None
+            continue
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors["conn"] += 1
+            cookie = None
+            continue
+        latencies.append(time.perf_counter() - start)
+    await client.close()
+
+
+def percentile(values: List[float], p: float) -> float:
+    """p-th percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(url: str, concurrency: int, duration: float,
+              login_ratio: float, email: str, password: str) -> dict:
+    """Load one server, return its measures"""
+    emails = [email.format(i) for i in range(concurrency)]
+    setup = Client(url)
+    for user_email in emails:
+        await setup.request("POST", "/users",
+                            {"email": user_email, "password": password})
+    await setup.close()
+
+    latencies, errors = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(url, user_email, password,
+                                  start + duration, login_ratio, latencies,
+                                  errors)
+                           for user_email in emails))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"rps": len(latencies) / elapsed,
+            "errors": ",".join("{}:{}".format(k, v)
+                               for k, v in sorted(errors.items())) or "0",
+            "p50": percentile(latencies, 50) * 1000,
+            "p99": percentile(latencies, 99) * 1000}
+
+
+def main():
+    """Parse the arguments and run the load tests"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("servers", nargs="+", metavar="name=url")
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--login-ratio", type=float, default=0.1)
+    parser.add_argument("--email", default="load{}@test.com",
+                        help="email of the users, {} is the client index")
+    parser.add_argument("--password", default="load-test")
+    args = parser.parse_args()
+
+    print("{:<8} {:>6} {:>10} {:>10} {:>10}  {}".format(
+        "server", "conc", "req/s", "p50 ms", "p99 ms", "errors"))
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        for server in args.servers:
+            name, _, url = server.partition("=")
+            result = asyncio.run(run(url, concurrency, args.duration,
+                                     args.login_ratio, args.email,
+                                     args.password))
+            print("{:<8} {:>6} {:>10.1f} {:>10.1f} {:>10.1f}  {}".format(
+                name, concurrency, result["rps"], result["p50"],
+                result["p99"], result["errors"]))
+
+
+if __name__ == "__main__":
+    main()
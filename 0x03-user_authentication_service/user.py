@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """Module for authentication service"""
 
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, Index, String, Integer
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -16,3 +16,11 @@ class User(Base):
     hashed_password = Column(String(250), nullable=False)
     session_id = Column(String(250), nullable=True)
     reset_token = Column(String(250), nullable=True)
+
+    # unique lookups by email, session and reset token; several NULL
+    # session_id / reset_token are allowed
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_session_id", "session_id", unique=True),
+        Index("ix_users_reset_token", "reset_token", unique=True),
+    )